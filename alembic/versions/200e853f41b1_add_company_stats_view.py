@@ -0,0 +1,69 @@
+"""Add company stats materialized view
+
+Revision ID: 200e853f41b1
+Revises: bb2f3abd4981
+Create Date: 2026-10-18 12:41:07.662013
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '200e853f41b1'
+down_revision: Union[str, Sequence[str], None] = 'bb2f3abd4981'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RANKED_METRICS = ['users', 'projects', 'memberships']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE MATERIALIZED VIEW company_stats AS
+        SELECT
+            stats.*,
+            CASE WHEN stats.projects > 0
+                 THEN stats.memberships::double precision / stats.projects
+                 ELSE 0
+            END AS avg_members_per_project,
+            rank() OVER (ORDER BY stats.users DESC) AS users_rank,
+            rank() OVER (ORDER BY stats.projects DESC) AS projects_rank,
+            rank() OVER (ORDER BY stats.memberships DESC) AS memberships_rank,
+            now() AS refreshed_at
+        FROM (
+            SELECT
+                c.id AS company_id,
+                c.name,
+                c.domain,
+                coalesce(u.total, 0) AS users,
+                coalesce(p.total, 0) AS projects,
+                coalesce(m.total, 0) AS memberships
+            FROM companies c
+            LEFT JOIN (SELECT company_id, count(*) AS total FROM users GROUP BY company_id) u
+                ON u.company_id = c.id
+            LEFT JOIN (SELECT company_id, count(*) AS total FROM projects GROUP BY company_id) p
+                ON p.company_id = c.id
+            LEFT JOIN (SELECT company_id, count(*) AS total FROM project_memberships GROUP BY company_id) m
+                ON m.company_id = c.id
+        ) stats
+    """)
+
+    # REFRESH ... CONCURRENTLY requires a unique index
+    op.create_index('ux_company_stats_company_id', 'company_stats', ['company_id'], unique=True)
+
+    # Leaderboards page by (rank, company_id), so each ranking gets its own index
+    for metric in RANKED_METRICS:
+        op.create_index(
+            f'ix_company_stats_{metric}_rank',
+            'company_stats',
+            [f'{metric}_rank', 'company_id']
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP MATERIALIZED VIEW company_stats")
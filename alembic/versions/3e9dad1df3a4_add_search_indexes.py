@@ -0,0 +1,77 @@
+"""Add search indexes
+
+Revision ID: 3e9dad1df3a4
+Revises: 200e853f41b1
+Create Date: 2026-10-18 14:26:53.418207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e9dad1df3a4'
+down_revision: Union[str, Sequence[str], None] = '200e853f41b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # users has millions of rows: the indexes are built CONCURRENTLY so
+    # writes go on during the build, which can't run in a transaction.
+    with op.get_context().autocommit_block():
+        # Prefix matches: lower(column) compared with the pattern operators
+        # (~>=~, ~<~), which text_pattern_ops indexes whatever the collation.
+        op.create_index(
+            'ix_users_email_pattern', 'users', [sa.text('lower(email) text_pattern_ops')],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_companies_name_pattern', 'companies', [sa.text('lower(name) text_pattern_ops')],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_companies_domain_pattern', 'companies', [sa.text('lower(domain) text_pattern_ops')],
+            postgresql_concurrently=True
+        )
+
+        # Fuzzy matches. users.email gets a GiST index rather than GIN: GiST
+        # can scan by word similarity distance (<<->) and stop after the
+        # first rows, while with GIN every match of a common fragment (say
+        # "gmail") would be scored and sorted before keeping the best ones.
+        # Companies are few enough for GIN, which is faster to filter with.
+        op.create_index(
+            'ix_users_email_trgm', 'users', ['email'],
+            postgresql_using='gist', postgresql_ops={'email': 'gist_trgm_ops'},
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_companies_name_trgm', 'companies', ['name'],
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_companies_domain_trgm', 'companies', ['domain'],
+            postgresql_using='gin', postgresql_ops={'domain': 'gin_trgm_ops'},
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # pg_trgm stays installed, other objects may depend on it
+    with op.get_context().autocommit_block():
+        for index, table in (
+            ('ix_companies_domain_trgm', 'companies'),
+            ('ix_companies_name_trgm', 'companies'),
+            ('ix_users_email_trgm', 'users'),
+            ('ix_companies_domain_pattern', 'companies'),
+            ('ix_companies_name_pattern', 'companies'),
+            ('ix_users_email_pattern', 'users'),
+        ):
+            op.drop_index(index, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,37 @@
+"""Add users company keyset index
+
+Revision ID: 6e4b7a0f5755
+Revises: 3e9dad1df3a4
+Create Date: 2026-10-18 15:03:18.771940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e4b7a0f5755'
+down_revision: Union[str, Sequence[str], None] = '3e9dad1df3a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # GET /users?company_id= pages by (email, id) within a company: with
+    # ix_users_company_id alone, every page would sort all of the company's
+    # users, this one seeks straight to the next page. It's built
+    # CONCURRENTLY so writes to users go on during the build.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_company_id_email_id', 'users', ['company_id', 'email', 'id'],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_company_id_email_id', table_name='users', postgresql_concurrently=True)
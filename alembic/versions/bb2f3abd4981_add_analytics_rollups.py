@@ -0,0 +1,98 @@
+"""Add hourly analytics rollups maintained by triggers
+
+Revision ID: bb2f3abd4981
+Revises: c09d4b73aee6
+Create Date: 2026-10-18 11:24:50.219307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bb2f3abd4981'
+down_revision: Union[str, Sequence[str], None] = 'c09d4b73aee6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same reasoning as the platform counters: every insert of the current hour
+# hits the same bucket, so it's spread over several rows.
+ROLLUP_SLOTS = 16
+
+ROLLED_UP_TABLES = [
+    ('users', 'users'),
+    ('projects', 'projects'),
+    ('project_memberships', 'memberships'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'analytics_rollups',
+        sa.Column('metric', sa.String(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('slot', sa.SmallInteger(), nullable=False),
+        sa.Column('total', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('metric', 'bucket_start', 'slot')
+    )
+
+    # TG_ARGV[0] is the metric name. Rows are bucketed by the UTC hour of
+    # their created_at; day and week buckets are aggregated from the hours.
+    op.execute(f"""
+        CREATE FUNCTION rollups_maintain()
+        RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            target_slot smallint := floor(random() * {ROLLUP_SLOTS})::smallint;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO analytics_rollups (metric, bucket_start, slot, total)
+                SELECT TG_ARGV[0], date_trunc('hour', created_at, 'UTC'), target_slot, count(*)
+                FROM new_rows
+                WHERE created_at IS NOT NULL
+                GROUP BY 2
+                ON CONFLICT (metric, bucket_start, slot)
+                DO UPDATE SET total = analytics_rollups.total + EXCLUDED.total;
+            ELSE
+                INSERT INTO analytics_rollups (metric, bucket_start, slot, total)
+                SELECT TG_ARGV[0], date_trunc('hour', created_at, 'UTC'), target_slot, -count(*)
+                FROM old_rows
+                WHERE created_at IS NOT NULL
+                GROUP BY 2
+                ON CONFLICT (metric, bucket_start, slot)
+                DO UPDATE SET total = analytics_rollups.total + EXCLUDED.total;
+            END IF;
+
+            RETURN NULL;
+        END
+        $$
+    """)
+
+    for table, metric in ROLLED_UP_TABLES:
+        for event, transition in (('INSERT', 'NEW TABLE AS new_rows'), ('DELETE', 'OLD TABLE AS old_rows')):
+            op.execute(f"""
+                CREATE TRIGGER {table}_rollup_{event.lower()}
+                AFTER {event} ON {table}
+                REFERENCING {transition}
+                FOR EACH STATEMENT EXECUTE FUNCTION rollups_maintain('{metric}')
+            """)
+
+        op.execute(f"""
+            INSERT INTO analytics_rollups (metric, bucket_start, slot, total)
+            SELECT '{metric}', date_trunc('hour', created_at, 'UTC'), 0, count(*)
+            FROM {table}
+            WHERE created_at IS NOT NULL
+            GROUP BY 2
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, _ in ROLLED_UP_TABLES:
+        op.execute(f"DROP TRIGGER {table}_rollup_insert ON {table}")
+        op.execute(f"DROP TRIGGER {table}_rollup_delete ON {table}")
+
+    op.execute("DROP FUNCTION rollups_maintain()")
+    op.drop_table('analytics_rollups')
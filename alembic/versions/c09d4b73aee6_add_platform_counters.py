@@ -0,0 +1,242 @@
+"""Add platform counters maintained by triggers
+
+Revision ID: c09d4b73aee6
+Revises: caff0b292ec0
+Create Date: 2026-10-18 10:02:13.871904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c09d4b73aee6'
+down_revision: Union[str, Sequence[str], None] = 'caff0b292ec0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Platform-wide totals are spread over several rows so concurrent writers
+# don't all queue on the same row lock; readers sum the slots.
+COUNTER_SLOTS = 16
+
+# (trigger table, counter table, key column, counter column, platform total, platform non-zero)
+COUNTED_TABLES = [
+    ('users', 'company_counters', 'company_id', 'users', 'users', 'companies_with_users'),
+    ('projects', 'company_counters', 'company_id', 'projects', 'projects', 'companies_with_projects'),
+    ('project_memberships', 'company_counters', 'company_id', 'memberships', 'memberships', ''),
+    ('project_memberships', 'project_counters', 'project_id', 'members', '', 'projects_with_members'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'platform_counters',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('slot', sa.SmallInteger(), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('name', 'slot')
+    )
+
+    op.create_table(
+        'company_counters',
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('users', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('projects', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('memberships', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('company_id')
+    )
+
+    op.create_table(
+        'project_counters',
+        sa.Column('project_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('members', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('project_id')
+    )
+
+    op.execute(f"""
+        CREATE FUNCTION bump_platform_counter(counter text, delta bigint)
+        RETURNS void LANGUAGE plpgsql AS $$
+        DECLARE
+            target_slot smallint := floor(random() * {COUNTER_SLOTS})::smallint;
+        BEGIN
+            IF delta <> 0 THEN
+                UPDATE platform_counters
+                SET value = value + delta
+                WHERE name = counter AND slot = target_slot;
+            END IF;
+        END
+        $$
+    """)
+
+    # Entity rows get their own counter row as they are created
+    for table, counter_table, key_column in (
+        ('companies', 'company_counters', 'company_id'),
+        ('projects', 'project_counters', 'project_id'),
+    ):
+        op.execute(f"""
+            CREATE FUNCTION counters_create_{counter_table}()
+            RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                INSERT INTO {counter_table} ({key_column}) SELECT id FROM new_rows;
+                RETURN NULL;
+            END
+            $$
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_create_{counter_table}
+            AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION counters_create_{counter_table}()
+        """)
+
+    op.execute("""
+        CREATE FUNCTION counters_count_companies()
+        RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM bump_platform_counter('companies', (SELECT count(*) FROM new_rows));
+            ELSE
+                PERFORM bump_platform_counter('companies', -(SELECT count(*) FROM old_rows));
+            END IF;
+
+            RETURN NULL;
+        END
+        $$
+    """)
+
+    for event, transition in (('INSERT', 'NEW TABLE AS new_rows'), ('DELETE', 'OLD TABLE AS old_rows')):
+        op.execute(f"""
+            CREATE TRIGGER companies_count_{event.lower()}
+            AFTER {event} ON companies
+            REFERENCING {transition}
+            FOR EACH STATEMENT EXECUTE FUNCTION counters_count_companies()
+        """)
+
+    # Generic statement-level counter maintenance. Changed rows are grouped by
+    # key so a bulk INSERT touches each counter row once, and the number of
+    # counter rows crossing zero feeds the "non-zero" platform totals used for
+    # the averages.
+    #
+    # TG_ARGV: counter table, key column, counter column, platform total
+    # counter and platform non-zero counter ('' to skip either of them).
+    op.execute("""
+        CREATE FUNCTION counters_maintain()
+        RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            direction integer := CASE TG_OP WHEN 'INSERT' THEN 1 ELSE -1 END;
+            changed text := CASE TG_OP WHEN 'INSERT' THEN 'new_rows' ELSE 'old_rows' END;
+            changed_total bigint;
+            crossed_zero bigint;
+        BEGIN
+            EXECUTE format(
+                'WITH delta AS ('
+                '    SELECT %2$I AS counter_key, count(*) AS total FROM %4$I GROUP BY %2$I'
+                '), bumped AS ('
+                '    UPDATE %1$I c SET %3$I = c.%3$I + $1 * d.total'
+                '    FROM delta d WHERE c.%2$I = d.counter_key'
+                '    RETURNING c.%3$I AS value, d.total'
+                ') '
+                'SELECT (SELECT coalesce(sum(total), 0) FROM delta),'
+                '       (SELECT count(*) FROM bumped'
+                '        WHERE value = CASE WHEN $1 > 0 THEN total ELSE 0 END)',
+                TG_ARGV[0], TG_ARGV[1], TG_ARGV[2], changed
+            )
+            INTO changed_total, crossed_zero
+            USING direction;
+
+            IF TG_ARGV[3] <> '' THEN
+                PERFORM bump_platform_counter(TG_ARGV[3], direction * changed_total);
+            END IF;
+
+            IF TG_ARGV[4] <> '' THEN
+                PERFORM bump_platform_counter(TG_ARGV[4], direction * crossed_zero);
+            END IF;
+
+            RETURN NULL;
+        END
+        $$
+    """)
+
+    for table, counter_table, key_column, counter_column, total, non_zero in COUNTED_TABLES:
+        for event, transition in (('INSERT', 'NEW TABLE AS new_rows'), ('DELETE', 'OLD TABLE AS old_rows')):
+            op.execute(f"""
+                CREATE TRIGGER {table}_count_{counter_column}_{event.lower()}
+                AFTER {event} ON {table}
+                REFERENCING {transition}
+                FOR EACH STATEMENT EXECUTE FUNCTION counters_maintain(
+                    '{counter_table}', '{key_column}', '{counter_column}', '{total}', '{non_zero}'
+                )
+            """)
+
+    op.execute(f"""
+        CREATE FUNCTION rebuild_counters()
+        RETURNS void LANGUAGE plpgsql AS $$
+        BEGIN
+            -- Block writers so the rebuilt counters match a single snapshot
+            LOCK TABLE companies, users, projects, project_memberships IN SHARE MODE;
+
+            DELETE FROM company_counters;
+            INSERT INTO company_counters (company_id, users, projects, memberships)
+            SELECT c.id, coalesce(u.total, 0), coalesce(p.total, 0), coalesce(m.total, 0)
+            FROM companies c
+            LEFT JOIN (SELECT company_id, count(*) AS total FROM users GROUP BY company_id) u
+                ON u.company_id = c.id
+            LEFT JOIN (SELECT company_id, count(*) AS total FROM projects GROUP BY company_id) p
+                ON p.company_id = c.id
+            LEFT JOIN (SELECT company_id, count(*) AS total FROM project_memberships GROUP BY company_id) m
+                ON m.company_id = c.id;
+
+            DELETE FROM project_counters;
+            INSERT INTO project_counters (project_id, members)
+            SELECT p.id, coalesce(m.total, 0)
+            FROM projects p
+            LEFT JOIN (SELECT project_id, count(*) AS total FROM project_memberships GROUP BY project_id) m
+                ON m.project_id = p.id;
+
+            DELETE FROM platform_counters;
+            INSERT INTO platform_counters (name, slot, value)
+            SELECT totals.name, slot, CASE WHEN slot = 0 THEN totals.value ELSE 0 END
+            FROM (VALUES
+                ('companies', (SELECT count(*) FROM company_counters)),
+                ('users', (SELECT coalesce(sum(users), 0) FROM company_counters)),
+                ('projects', (SELECT coalesce(sum(projects), 0) FROM company_counters)),
+                ('memberships', (SELECT coalesce(sum(members), 0) FROM project_counters)),
+                ('companies_with_users', (SELECT count(*) FROM company_counters WHERE users > 0)),
+                ('companies_with_projects', (SELECT count(*) FROM company_counters WHERE projects > 0)),
+                ('projects_with_members', (SELECT count(*) FROM project_counters WHERE members > 0))
+            ) AS totals(name, value)
+            CROSS JOIN generate_series(0, {COUNTER_SLOTS - 1}) AS slot;
+        END
+        $$
+    """)
+
+    op.execute("SELECT rebuild_counters()")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, _, _, counter_column, _, _ in COUNTED_TABLES:
+        for event in ('insert', 'delete'):
+            op.execute(f"DROP TRIGGER {table}_count_{counter_column}_{event} ON {table}")
+
+    op.execute("DROP TRIGGER companies_count_insert ON companies")
+    op.execute("DROP TRIGGER companies_count_delete ON companies")
+    op.execute("DROP TRIGGER projects_create_project_counters ON projects")
+    op.execute("DROP TRIGGER companies_create_company_counters ON companies")
+
+    op.execute("DROP FUNCTION rebuild_counters()")
+    op.execute("DROP FUNCTION counters_maintain()")
+    op.execute("DROP FUNCTION counters_count_companies()")
+    op.execute("DROP FUNCTION counters_create_project_counters()")
+    op.execute("DROP FUNCTION counters_create_company_counters()")
+    op.execute("DROP FUNCTION bump_platform_counter(text, bigint)")
+
+    op.drop_table('project_counters')
+    op.drop_table('company_counters')
+    op.drop_table('platform_counters')
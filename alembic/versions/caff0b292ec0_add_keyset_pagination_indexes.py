@@ -0,0 +1,36 @@
+"""Add keyset pagination indexes
+
+Revision ID: caff0b292ec0
+Revises: 19ff71aac486
+Create Date: 2026-10-18 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'caff0b292ec0'
+down_revision: Union[str, Sequence[str], None] = '19ff71aac486'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Every list endpoint pages with a (sort key, id) row comparison, so each
+    # one needs a composite index to seek straight to the next page.
+    op.create_index('ix_companies_name_id', 'companies', ['name', 'id'])
+    op.create_index('ix_projects_name_id', 'projects', ['name', 'id'])
+    op.create_index('ix_projects_company_id_name_id', 'projects', ['company_id', 'name', 'id'])
+    op.create_index('ix_users_email_id', 'users', ['email', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_email_id', table_name='users')
+    op.drop_index('ix_projects_company_id_name_id', table_name='projects')
+    op.drop_index('ix_projects_name_id', table_name='projects')
+    op.drop_index('ix_companies_name_id', table_name='companies')
@@ -0,0 +1,99 @@
+"""Align company stats average with platform analytics
+
+Revision ID: d3e90c165a5f
+Revises: 6e4b7a0f5755
+Create Date: 2026-10-18 16:12:36.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3e90c165a5f'
+down_revision: Union[str, Sequence[str], None] = '6e4b7a0f5755'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RANKED_METRICS = ['users', 'projects', 'memberships']
+
+# The average is over the projects that have members, like the platform
+# analytics (members_per_project only has a row for those)
+MEMBERS_PER_PROJECT_WITH_MEMBERS = """
+    CASE WHEN stats.projects_with_members > 0
+         THEN stats.memberships::double precision / stats.projects_with_members
+         ELSE 0
+    END
+"""
+
+# The previous definition, over every project
+MEMBERS_PER_PROJECT = """
+    CASE WHEN stats.projects > 0
+         THEN stats.memberships::double precision / stats.projects
+         ELSE 0
+    END
+"""
+
+
+def create_view(average: str) -> None:
+    op.execute(f"""
+        CREATE MATERIALIZED VIEW company_stats AS
+        SELECT
+            stats.company_id,
+            stats.name,
+            stats.domain,
+            stats.users,
+            stats.projects,
+            stats.memberships,
+            {average} AS avg_members_per_project,
+            rank() OVER (ORDER BY stats.users DESC) AS users_rank,
+            rank() OVER (ORDER BY stats.projects DESC) AS projects_rank,
+            rank() OVER (ORDER BY stats.memberships DESC) AS memberships_rank,
+            now() AS refreshed_at
+        FROM (
+            SELECT
+                c.id AS company_id,
+                c.name,
+                c.domain,
+                coalesce(u.total, 0) AS users,
+                coalesce(p.total, 0) AS projects,
+                coalesce(m.total, 0) AS memberships,
+                coalesce(m.projects, 0) AS projects_with_members
+            FROM companies c
+            LEFT JOIN (SELECT company_id, count(*) AS total FROM users GROUP BY company_id) u
+                ON u.company_id = c.id
+            LEFT JOIN (SELECT company_id, count(*) AS total FROM projects GROUP BY company_id) p
+                ON p.company_id = c.id
+            LEFT JOIN (
+                SELECT company_id, count(*) AS total, count(DISTINCT project_id) AS projects
+                FROM project_memberships
+                GROUP BY company_id
+            ) m
+                ON m.company_id = c.id
+        ) stats
+    """)
+
+    # REFRESH ... CONCURRENTLY requires a unique index
+    op.create_index('ux_company_stats_company_id', 'company_stats', ['company_id'], unique=True)
+
+    # Leaderboards page by (rank, company_id), so each ranking gets its own index
+    for metric in RANKED_METRICS:
+        op.create_index(
+            f'ix_company_stats_{metric}_rank',
+            'company_stats',
+            [f'{metric}_rank', 'company_id']
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DROP MATERIALIZED VIEW company_stats")
+    create_view(MEMBERS_PER_PROJECT_WITH_MEMBERS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP MATERIALIZED VIEW company_stats")
+    create_view(MEMBERS_PER_PROJECT)
@@ -0,0 +1,65 @@
+from typing import Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+from uuid import UUID
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, Field
+
+MAX_BATCH_IDS = 500
+
+T = TypeVar("T")
+V = TypeVar("V")
+
+
+class Batch(BaseModel, Generic[T]):
+    items: List[T]
+    missing: List[UUID]
+
+
+class BatchGet(BaseModel):
+    ids: List[UUID] = Field(min_length=1, max_length=MAX_BATCH_IDS)
+
+
+def get_batch_ids(
+    ids: Optional[str] = Query(
+        None,
+        description=f"Comma-separated ids to fetch at once (up to {MAX_BATCH_IDS}), "
+                    f"instead of listing a page"
+    ),
+) -> Optional[List[UUID]]:
+    if ids is None:
+        return None
+
+    try:
+        parsed = [UUID(value.strip()) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated UUIDs")
+
+    if not parsed or len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"ids must hold between 1 and {MAX_BATCH_IDS} ids")
+
+    return parsed
+
+
+def in_request_order(ids: Sequence[UUID], found: Dict[UUID, V]) -> Tuple[List[V], List[UUID]]:
+    """
+    Line the results of a batch lookup up with the requested ids.
+
+    Args:
+        ids: The requested ids, duplicates are ignored
+        found: The entities found, by id
+
+    Returns:
+        The entities in the order of their first request, and the ids
+        that weren't found, in request order too
+    """
+
+    items, missing = [], []
+
+    for entity_id in dict.fromkeys(ids):
+        if entity_id in found:
+            items.append(found[entity_id])
+        else:
+            missing.append(entity_id)
+
+    return items, missing
@@ -0,0 +1,260 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Tuple, Union
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from app.core.config import get_settings
+from app.core.database import read_your_writes
+from app.core.metrics import CACHE_EVICTIONS, CACHE_HITS, CACHE_MISSES
+from app.core.rendering import RawJSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries: int, ttl: float):
+        """
+        In-process LRU cache with a TTL.
+
+        Each key holds a small map of fields (e.g. the pages of a listing),
+        so a write can drop everything cached about an entity at once.
+
+        Args:
+            max_entries: The maximum number of keys kept
+            ttl: Seconds a key lives after it is first filled
+        """
+
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, bytes]]]" = OrderedDict()
+
+    async def get(self, key: str, field: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        expires_at, fields = entry
+
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            CACHE_EVICTIONS.labels(_kind(key), "expired").inc()
+            return None
+
+        self._entries.move_to_end(key)
+
+        return fields.get(field)
+
+    async def set(self, key: str, field: str, value: bytes):
+        entry = self._entries.get(key)
+
+        if entry is None or entry[0] <= time.monotonic():
+            entry = (time.monotonic() + self.ttl, {})
+            self._entries[key] = entry
+
+        entry[1][field] = value
+        self._entries.move_to_end(key)
+        self._evict_overflow()
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def hold(self, keys: Sequence[str], seconds: float):
+        for key in keys:
+            self._entries[key] = (time.monotonic() + seconds, {HOLD_FIELD: b""})
+            self._entries.move_to_end(key)
+
+        self._evict_overflow()
+
+    def _evict_overflow(self):
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            CACHE_EVICTIONS.labels(_kind(evicted), "size").inc()
+
+
+class RedisCacheBackend:
+    def __init__(self, url: str, ttl: float):
+        """
+        Cache shared by every process through anything speaking the Redis
+        protocol (Redis, Valkey, KeyDB...). Keys are hashes of fields.
+
+        Args:
+            url: The server URL, e.g. redis://localhost:6379/0
+            ttl: Seconds a key lives after it is first filled
+        """
+
+        # Optional dependency, only needed with CACHE_BACKEND=redis
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.ttl = max(1, int(ttl))
+
+    async def get(self, key: str, field: str) -> Optional[bytes]:
+        return await self.client.hget(key, field)
+
+    async def set(self, key: str, field: str, value: bytes):
+        async with self.client.pipeline(transaction=True) as pipeline:
+            pipeline.hset(key, field, value)
+            pipeline.expire(key, self.ttl, nx=True)
+            await pipeline.execute()
+
+    async def delete(self, *keys: str):
+        await self.client.delete(*keys)
+
+    async def hold(self, keys: Sequence[str], seconds: float):
+        async with self.client.pipeline(transaction=True) as pipeline:
+            for key in keys:
+                pipeline.delete(key)
+                pipeline.hset(key, HOLD_FIELD, b"")
+                pipeline.expire(key, max(1, math.ceil(seconds)))
+
+            await pipeline.execute()
+
+
+CacheBackend = Union[MemoryCacheBackend, RedisCacheBackend]
+
+# Marks a key that was just invalidated, see ResponseCache.invalidate
+HOLD_FIELD = "!held"
+
+
+def _kind(key: str) -> str:
+    # "project_members:<id>" -> "project_members", a bounded metric label
+    return key.split(":", 1)[0]
+
+
+class ResponseCache:
+    def __init__(self, backend: Optional[CacheBackend], hold: Optional[float] = None):
+        """
+        Cache of the JSON bodies of entity reads.
+
+        The cache is an optimization only: if the backend fails, requests
+        are served from the database and the error is logged.
+
+        Clients pinned to the primary by read-your-writes bypass the cache,
+        so they never get a body from before their own write.
+
+        Args:
+            backend: Where the bodies are kept, None disables the cache
+            hold: Seconds an invalidated key stays unfilled, defaults to
+                the read-your-writes window
+        """
+
+        self.backend = backend
+        self.hold = get_settings().read_your_writes_window if hold is None else hold
+
+    async def fetch(
+            self,
+            key: str,
+            render: Callable[[], Awaitable[Union[BaseModel, Response]]],
+            field: str = ""
+    ) -> Response:
+        """
+        Serve a response from the cache, or render and cache it.
+
+        Only successful responses are cached, errors raised by render (like
+        a 404 HTTPException) propagate untouched.
+
+        Args:
+            key: The entity key, the unit of invalidation
+            render: Builds the response on a miss, as a route would
+            field: Tells apart the responses cached under a key, e.g. pages
+
+        Returns:
+            The response
+        """
+
+        state = read_your_writes.get()
+
+        if self.backend is None or (state is not None and state.pinned):
+            return await render()
+
+        try:
+            body = await self.backend.get(key, field)
+        except Exception:
+            logger.exception(f"Cache read of {key} failed")
+            body = None
+
+        if body is not None:
+            CACHE_HITS.labels(_kind(key)).inc()
+            return RawJSONResponse(body)
+
+        CACHE_MISSES.labels(_kind(key)).inc()
+
+        response = await render()
+
+        if isinstance(response, Response):
+            if response.status_code != 200:
+                return response
+
+            body = response.body
+        else:
+            # A validated model in the non-trusted mode, encoded the way
+            # FastAPI would
+            body = response.model_dump_json().encode()
+
+        try:
+            # The render may have read a replica that hasn't caught up with
+            # the write that invalidated the key, or started before it
+            if await self.backend.get(key, HOLD_FIELD) is None:
+                await self.backend.set(key, field, body)
+        except Exception:
+            logger.exception(f"Cache write of {key} failed")
+
+        return RawJSONResponse(body)
+
+    async def invalidate(self, *keys: str):
+        """
+        Drop everything cached under the keys, after a write.
+
+        The keys are held unfilled for a while rather than just deleted:
+        reads from replicas lag behind the primary, and a read that raced
+        with the write could otherwise put the old body back.
+        """
+
+        if self.backend is None or not keys:
+            return
+
+        try:
+            if self.hold > 0:
+                await self.backend.hold(keys, self.hold)
+            else:
+                await self.backend.delete(*keys)
+        except Exception:
+            # Entries expire after the TTL anyway
+            logger.exception(f"Cache invalidation of {', '.join(keys)} failed")
+
+
+def company_key(company_id) -> str:
+    return f"company:{company_id}"
+
+
+def company_users_key(company_id) -> str:
+    return f"company_users:{company_id}"
+
+
+def project_key(project_id) -> str:
+    return f"project:{project_id}"
+
+
+def project_members_key(project_id) -> str:
+    return f"project_members:{project_id}"
+
+
+def create_backend() -> Optional[CacheBackend]:
+    settings = get_settings()
+
+    if settings.cache_backend == "memory":
+        return MemoryCacheBackend(settings.cache_max_entries, settings.cache_ttl)
+
+    if settings.cache_backend == "redis":
+        return RedisCacheBackend(settings.cache_redis_url, settings.cache_ttl)
+
+    return None
+
+
+response_cache = ResponseCache(create_backend())
@@ -0,0 +1,132 @@
+import asyncio
+import copy
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from fastapi import Response
+
+from app.core.config import get_settings
+from app.core.database import read_your_writes
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Collapse concurrent calls with the same key into a single call whose
+        outcome, result or exception, is handed to every caller.
+
+        Nothing is kept once the call is done: a call starting after that
+        runs again, this is not a cache.
+        """
+
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn, or join the call already running for the same key.
+
+        The call runs in its own task so that a caller going away doesn't
+        cancel it for the others; it is only cancelled once nobody waits
+        for it anymore. A cancelled leader (the caller that started the
+        call) still waits for the call to finish when others have joined,
+        because the call may be using resources it owns, like its session.
+
+        Args:
+            key: What identifies identical calls
+            fn: Makes the call
+
+        Returns:
+            The result of the call
+        """
+
+        flight = self._flights.get(key)
+        leader = flight is None
+
+        if leader:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(functools.partial(self._landed, key, flight))
+
+        flight.waiters += 1
+
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                if leader and flight.waiters > 1:
+                    await asyncio.wait([flight.task])
+                elif flight.waiters == 1:
+                    flight.task.cancel()
+
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _landed(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+        # Mark the exception as retrieved when every waiter left before it
+        if not task.cancelled():
+            task.exception()
+
+
+single_flight = SingleFlight()
+
+
+def _own_copy(result: Any) -> Any:
+    # FastAPI attaches the request's background tasks to a returned response
+    # and middlewares may touch its headers, so every caller gets its own
+    if isinstance(result, Response):
+        response = copy.copy(result)
+        response.background = None
+        response.raw_headers = list(result.raw_headers)
+
+        return response
+
+    return result
+
+
+def coalesce(*key_params: str):
+    """
+    Route decorator sharing one in-flight call between identical concurrent
+    requests, when the coalesce_reads setting is on.
+
+    Requests are identical when they hit the same route with the same
+    key_params, and read from the same place: a client pinned to the
+    primary by read-your-writes never joins a call reading from a replica.
+    Only use it on read-only routes.
+
+        @router.get("/projects/{project_id}")
+        @coalesce("project_id")
+        async def get_project_details(project_id: UUID, ...):
+
+    Args:
+        key_params: The route parameters that identify the response
+    """
+
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            if not get_settings().coalesce_reads:
+                return await endpoint(*args, **kwargs)
+
+            state = read_your_writes.get()
+            key = (
+                endpoint.__module__,
+                endpoint.__qualname__,
+                state is not None and state.pinned,
+                *(repr(kwargs[name]) for name in key_params)
+            )
+
+            return _own_copy(await single_flight.do(key, lambda: endpoint(*args, **kwargs)))
+
+        return wrapper
+
+    return decorator
@@ -1,23 +1,125 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+import itertools
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, declarative_base
 
 from app.core.config import get_settings
+from app.core.loader import finish_batches
+from app.core.metrics import instrument_engine
+from app.core.pool import InstrumentedQueuePool
 
 Base = declarative_base()
 
-engine = create_async_engine(
-    get_settings().database_url,
-    echo=True,
-    future=True)
+settings = get_settings()
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=settings.db_echo,
+        future=True,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args={
+            # SQLAlchemy prepares every statement through its own cache, asyncpg's
+            # cache only covers its direct execute calls; both get the same size
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+            "statement_cache_size": settings.db_statement_cache_size,
+        })
+
+
+engine = _create_engine(settings.database_url)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+replica_engines: List[AsyncEngine] = [_create_engine(url) for url in settings.database_replica_urls]
+instrument_engine(engine, "primary")
+
+for index, replica in enumerate(replica_engines):
+    instrument_engine(replica, f"replica-{index}")
+
+replica_session_makers = [
+    async_sessionmaker(replica, expire_on_commit=False) for replica in replica_engines
+]
+_next_replica = itertools.cycle(replica_session_makers)
+
+
+class ReadYourWrites:
+    def __init__(self, pinned_until: float = 0.0):
+        """
+        Per-request read-your-writes state, see ReadYourWritesMiddleware.
+
+        Args:
+            pinned_until: Unix time until which reads stay on the primary
+        """
+
+        self.pinned_until = pinned_until
+        self.wrote = False
+
+    @property
+    def pinned(self) -> bool:
+        return self.wrote or self.pinned_until > time.time()
+
+
+read_your_writes: ContextVar[Optional[ReadYourWrites]] = ContextVar("read_your_writes", default=None)
+
+
+# Read paths never commit and every write path does, which also covers
+# writes hidden in data-modifying CTEs that the ORM can't tell apart from
+# plain SELECTs
+@event.listens_for(Session, "after_commit")
+def _committed(session: Session):
+    state = read_your_writes.get()
+
+    if state is not None:
+        state.wrote = True
+
+
+def read_session_maker() -> async_sessionmaker:
+    """
+    Pick the session factory for a read-only unit of work: the next replica
+    in round-robin order, or the primary when there are no replicas or the
+    current request has to see its own recent writes.
+    """
+
+    state = read_your_writes.get()
+
+    if not replica_session_makers or (state is not None and state.pinned):
+        return async_session_maker
+
+    return next(_next_replica)
+
 
 async def get_session():
     async with async_session_maker() as session:
         try:
             yield session
         except Exception:
+            await finish_batches(session)
+            await session.rollback()
+            raise
+        finally:
+            await finish_batches(session)
+            await session.close()
+
+
+async def get_read_session():
+    """Like get_session, for endpoints that only read, see read_session_maker."""
+
+    async with read_session_maker()() as session:
+        try:
+            yield session
+        except Exception:
+            await finish_batches(session)
             await session.rollback()
             raise
         finally:
+            await finish_batches(session)
             await session.close()
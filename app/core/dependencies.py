@@ -1,6 +1,6 @@
-
 from fastapi import Depends
-from app.core.database import get_session
+from app.core.database import get_read_session, get_session
+from app.features.analytics.service import AnalyticsService
 from app.features.companies.service import CompanyService
 from app.features.projects.service import ProjectService
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -22,3 +22,25 @@ def get_company_service(session: AsyncSession = Depends(
 def get_user_service(session: AsyncSession = Depends(
         get_session)) -> UserService:
     return UserService(session)
+
+
+# Read-only counterparts, served by a replica when there is one
+def get_project_read_service(
+    session: AsyncSession = Depends(get_read_session),
+) -> ProjectService:
+    return ProjectService(session)
+
+
+def get_company_read_service(session: AsyncSession = Depends(
+        get_read_session)) -> CompanyService:
+    return CompanyService(session)
+
+
+def get_user_read_service(session: AsyncSession = Depends(
+        get_read_session)) -> UserService:
+    return UserService(session)
+
+
+def get_analytics_service(session: AsyncSession = Depends(
+        get_read_session)) -> AnalyticsService:
+    return AnalyticsService(session)
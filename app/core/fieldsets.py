@@ -0,0 +1,76 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+
+
+class Fieldset(BaseModel):
+    fields: List[str]
+    include: List[str]
+    sparse: bool
+
+    def cache_field(self) -> str:
+        return f"{','.join(self.fields)}:{','.join(self.include)}"
+
+
+def _parse(name: str, value: Optional[str], allowed: Sequence[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+
+    names = list(dict.fromkeys(item.strip() for item in value.split(",") if item.strip()))
+    unknown = [item for item in names if item not in allowed]
+
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown {name}: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+
+    return names
+
+
+def fieldset_params(
+        model: Type[BaseModel],
+        includes: Sequence[str],
+        default_include: Sequence[str] = ()
+):
+    """
+    Build a dependency parsing ?fields= and ?include= for a read endpoint.
+
+    Args:
+        model: The response model of the entity, whose fields can be picked
+        includes: The related data that can be embedded
+        default_include: What is embedded when include isn't given
+
+    Returns:
+        The dependency, which returns a Fieldset; sparse is False when the
+        caller asked for the default representation
+    """
+
+    # An embedded list comes with the cursor of its next page
+    related = {*includes, *(f"{name}_next_cursor" for name in includes)}
+    allowed_fields = [name for name in model.model_fields if name not in related]
+
+    def get_fieldset(
+        fields: Optional[str] = Query(
+            None, description=f"Comma-separated fields to return, among: {', '.join(allowed_fields)}"),
+        include: Optional[str] = Query(
+            None, description=f"Comma-separated related data to embed, among: {', '.join(includes)}"),
+    ) -> Fieldset:
+        picked_fields = _parse("fields", fields, allowed_fields)
+        picked_includes = _parse("include", include, includes)
+
+        return Fieldset(
+            # The id always comes along, it's what the client will key on
+            fields=list(dict.fromkeys(["id", *(picked_fields or allowed_fields)])),
+            include=list(default_include if picked_includes is None else picked_includes),
+            sparse=picked_fields is not None or picked_includes is not None
+        )
+
+    return get_fieldset
+
+
+def pick(obj: Any, fields: Iterable[str]) -> Dict[str, Any]:
+    """The given attributes of an object, as a dict ready for serialization."""
+
+    return {name: getattr(obj, name) for name in fields}
@@ -0,0 +1,243 @@
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, Tuple, TypeVar, Union
+from uuid import UUID
+
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as pgUUID
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.config import get_settings
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Keeps every batch query within a sane parameter size
+MAX_BATCH_SIZE = 1000
+
+
+def uuid_array(name: str, values: List[UUID]):
+    """
+    Bind a list of ids as a single uuid[] parameter, for `= ANY(...)` and
+    `unnest(...)`: the statement is the same whatever the number of ids,
+    so it stays in the prepared statement cache.
+    """
+
+    return bindparam(name, values, type_=ARRAY(pgUUID(as_uuid=True)))
+
+
+class BatchLoader(Generic[K, V]):
+    def __init__(
+            self,
+            load_many: Callable[[List[K]], Awaitable[Dict[K, V]]],
+            window: float = 0.0,
+            shared: bool = False,
+            tasks: Optional[Set[asyncio.Task]] = None
+    ):
+        """
+        Collect the lookups made in the same event loop tick (or within a
+        small window) and serve them with a single call to load_many.
+
+        Args:
+            load_many: Loads a batch of keys, returning the values found by key
+            window: Seconds to wait for more lookups before loading, 0 only
+                batches the lookups of the current tick
+            shared: Whether lookups come from several requests, in which
+                case batches run in an empty context rather than in the one
+                of the request that happened to start them, so its query
+                stats and metrics aren't charged for the others
+            tasks: Where to keep the batches while they run, by default a
+                set of the loader's own; see session_batches
+        """
+
+        self.load_many = load_many
+        self.window = window
+        self.shared = shared
+        self._pending: Dict[K, asyncio.Future] = {}
+        # The event loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = tasks if tasks is not None else set()
+
+    async def load(self, key: K) -> Optional[V]:
+        """
+        Look a key up as part of the next batch.
+
+        Args:
+            key: The key to look up
+
+        Returns:
+            The value, or None if load_many didn't return one for the key
+        """
+
+        future = self._pending.get(key)
+
+        if future is None:
+            loop = asyncio.get_running_loop()
+
+            if not self._pending:
+                if self.window > 0:
+                    loop.call_later(self.window, self._dispatch)
+                else:
+                    loop.call_soon(self._dispatch)
+
+            future = loop.create_future()
+            self._pending[key] = future
+
+        # Shielded: a caller going away must not cancel the lookup for the
+        # other callers waiting on the same key
+        return await asyncio.shield(future)
+
+    def _dispatch(self):
+        pending, self._pending = self._pending, {}
+        batch = list(pending.items())
+
+        chunks = [batch[start:start + MAX_BATCH_SIZE] for start in range(0, len(batch), MAX_BATCH_SIZE)]
+
+        if self.shared:
+            # Each chunk is loaded on a session of its own
+            for chunk in chunks:
+                self._spawn(self._load(chunk), contextvars.Context())
+        else:
+            # The chunks share the caller's session, which runs one
+            # statement at a time
+            self._spawn(self._load_each(chunks))
+
+    def _spawn(self, coroutine, context: Optional[contextvars.Context] = None):
+        task = asyncio.create_task(coroutine, context=context)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _load_each(self, chunks: List[List[Tuple[K, asyncio.Future]]]):
+        for chunk in chunks:
+            await self._load(chunk)
+
+    async def _load(self, batch: List[Tuple[K, asyncio.Future]]):
+        try:
+            values = await self.load_many([key for key, _ in batch])
+        except BaseException as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+            if not isinstance(e, Exception):
+                raise
+
+            return
+
+        for key, future in batch:
+            if not future.done():
+                future.set_result(values.get(key))
+
+
+class SessionLoader(Generic[K, V]):
+    def __init__(self, loader: BatchLoader[K, V], session: AsyncSession):
+        """
+        A shared loader, as seen from one session: every entity it returns
+        is merged into the session, so each request gets an instance of its
+        own rather than the one every request of the batch was given.
+
+        Args:
+            loader: The shared loader
+            session: The session of the request
+        """
+
+        self.loader = loader
+        self.session = session
+
+    async def load(self, key: K) -> Optional[V]:
+        """
+        Look a key up as part of the shared loader's next batch.
+
+        Args:
+            key: The key to look up
+
+        Returns:
+            The entity, attached to the session, or None if it wasn't found
+        """
+
+        value = await self.loader.load(key)
+
+        if value is None:
+            return None
+
+        # Copies the loaded state without querying, the batch just did
+        return await self.session.merge(value, load=False)
+
+
+def session_batches(session: AsyncSession) -> Set[asyncio.Task]:
+    """The batches running on a session, see finish_batches."""
+
+    return session.info.setdefault("batch_tasks", set())
+
+
+async def finish_batches(session: AsyncSession):
+    """
+    Cancel the batches still running on a session and wait for them to
+    stop, before the session is closed.
+
+    A batch outlives a caller that is cancelled, it is shielded for the
+    others: when the request itself is cancelled, its batches would
+    otherwise go on using the session after it was closed.
+
+    Args:
+        session: The session about to be closed
+    """
+
+    tasks = list(session.info.get("batch_tasks", ()))
+
+    for task in tasks:
+        task.cancel()
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Loaders shared by every request, one per kind of entity and engine
+_shared_loaders: Dict[Tuple[str, AsyncEngine], BatchLoader] = {}
+
+
+def entity_loader(
+        session: AsyncSession,
+        name: str,
+        load_many: Callable[[AsyncSession, List[K]], Awaitable[Dict[K, V]]]
+) -> Union[BatchLoader[K, V], SessionLoader[K, V]]:
+    """
+    Get the loader a service should use for an entity.
+
+    With the batch_loader_scope setting at "request" (the default), the
+    loader batches the lookups made on this session, i.e. by one request,
+    and runs them on it. At "global", lookups from every request using the
+    same engine are batched together, each batch on a session of its own
+    that is closed once loaded; the entities are then merged into the
+    request's session, so no two requests share an instance.
+
+    Args:
+        session: The service's session
+        name: The kind of entity, e.g. "companies"
+        load_many: Loads a batch of keys on a given session
+
+    Returns:
+        The loader
+    """
+
+    settings = get_settings()
+
+    if settings.batch_loader_scope == "request":
+        return BatchLoader(
+            lambda keys: load_many(session, keys),
+            settings.batch_loader_window,
+            tasks=session_batches(session)
+        )
+
+    engine = session.bind
+    loader = _shared_loaders.get((name, engine))
+
+    if loader is None:
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def load_in_own_session(keys: List[K]) -> Dict[K, V]:
+            async with session_maker() as own_session:
+                return await load_many(own_session, keys)
+
+        loader = BatchLoader(load_in_own_session, settings.batch_loader_window, shared=True)
+        _shared_loaders[(name, engine)] = loader
+
+    return SessionLoader(loader, session)
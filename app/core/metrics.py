@@ -0,0 +1,271 @@
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.query_stats import record_statement
+
+# Requests that didn't match a route (404s, scanners) share one label
+# instead of creating a series per path
+UNMATCHED_ROUTE = "unmatched"
+
+# Statements run outside of an instrumented service method
+NO_SERVICE_METHOD = "none"
+
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "HTTP requests handled, by route template and status code",
+    ["method", "route", "status"]
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    ["method", "route", "status"]
+)
+
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being handled",
+    ["method"]
+)
+
+STATEMENT_LATENCY = Histogram(
+    "db_statement_duration_seconds",
+    "Time spent executing SQL statements, by engine and calling service method",
+    ["engine", "service_method"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+CACHE_HITS = Counter(
+    "cache_hits_total",
+    "Responses served from the response cache, by kind of key",
+    ["kind"]
+)
+
+CACHE_MISSES = Counter(
+    "cache_misses_total",
+    "Responses rendered because they weren't in the response cache, by kind of key",
+    ["kind"]
+)
+
+CACHE_EVICTIONS = Counter(
+    "cache_evictions_total",
+    "Keys dropped from the in-process cache, by kind of key and reason (size or expired)",
+    ["kind", "reason"]
+)
+
+service_method: ContextVar[str] = ContextVar("service_method", default=NO_SERVICE_METHOD)
+
+
+def instrument_service(cls):
+    """
+    Class decorator labelling the statements run by each public method of
+    a service with "<Class>.<method>" in db_statement_duration_seconds.
+    """
+
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_"):
+            continue
+
+        label = f"{cls.__name__}.{name}"
+
+        if inspect.iscoroutinefunction(method):
+            setattr(cls, name, _label_coroutine(method, label))
+        elif inspect.isasyncgenfunction(method):
+            setattr(cls, name, _label_async_generator(method, label))
+
+    return cls
+
+
+def _label_coroutine(method, label: str):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = service_method.set(label)
+
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            service_method.reset(token)
+
+    return wrapper
+
+
+def _label_async_generator(method, label: str):
+    # The generator body runs in its consumer's context, so the label is
+    # only set while the generator itself is running
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        generator = method(*args, **kwargs)
+
+        try:
+            while True:
+                token = service_method.set(label)
+
+                try:
+                    item = await generator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    service_method.reset(token)
+
+                yield item
+        finally:
+            # Consumers that stop early close us, the cursor must close too
+            await generator.aclose()
+
+    return wrapper
+
+
+def instrument_engine(engine: AsyncEngine, name: str):
+    """
+    Time every statement run on the engine and publish its pool's
+    statistics, read at scrape time so checkouts don't pay for them.
+
+    Args:
+        engine: The engine to instrument
+        name: The engine label, e.g. "primary" or "replica-0"
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started_at = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._metrics_started_at
+
+        STATEMENT_LATENCY.labels(name, service_method.get()).observe(duration)
+        record_statement(statement, duration)
+
+    REGISTRY.register(PoolCollector(engine, name))
+
+
+class PoolCollector:
+    def __init__(self, engine: AsyncEngine, name: str):
+        """
+        Prometheus collector for the statistics of an InstrumentedQueuePool.
+
+        Args:
+            engine: The engine whose pool is reported
+            name: The engine label
+        """
+
+        self.engine = engine
+        self.name = name
+
+    def collect(self) -> Iterator:
+        stats = self.engine.pool.stats()
+        labels = [self.name]
+
+        for key, description in (
+            ("size", "Connections kept open by the pool"),
+            ("max_overflow", "Connections the pool may open beyond its size"),
+            ("checked_out", "Connections currently in use"),
+            ("checked_in", "Idle connections in the pool"),
+            ("overflow", "Connections currently open beyond the pool size"),
+        ):
+            gauge = GaugeMetricFamily(f"db_pool_{key}", description, labels=["engine"])
+            gauge.add_metric(labels, stats[key])
+            yield gauge
+
+        timeouts = CounterMetricFamily(
+            "db_pool_timeouts", "Checkouts that gave up after pool_timeout", labels=["engine"])
+        timeouts.add_metric(labels, stats["timeouts"])
+        yield timeouts
+
+        wait = stats["wait_seconds"]
+        wait_time = HistogramMetricFamily(
+            "db_pool_wait_seconds", "Time spent waiting for a connection", labels=["engine"])
+        wait_time.add_metric(labels, list(wait["buckets"].items()), wait["sum"])
+        yield wait_time
+
+
+def route_template(scope: Scope, path: str) -> str:
+    """
+    The full path template of the route a request matched.
+
+    The route in the scope doesn't always hold the prefixes it was included
+    or mounted with: FastAPI keeps an included router's routes unprefixed,
+    and a mounted app's routes are relative to the mount. The prefix is the
+    part of the path before what the route matched.
+
+    Args:
+        scope: The scope of the request, once routed
+        path: The path of the request, before routing
+
+    Returns:
+        The template, e.g. /internal/pool, or "unmatched"
+    """
+
+    route = scope.get("route")
+
+    if route is None:
+        return UNMATCHED_ROUTE
+
+    path_regex = getattr(route, "path_regex", None)
+    start = 0
+
+    # Shortest prefix first: path parameters don't match across a "/", so
+    # the longest tail the route matches is the one it was routed on
+    while path_regex is not None and start != -1:
+        if path_regex.match(path[start:]):
+            return path[:start] + route.path
+
+        start = path.find("/", start + 1)
+
+    return route.path
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        """
+        Count and time every HTTP request by route template and status code.
+
+        The route template is read from the scope once routing is done, so
+        /projects/{project_id} is a single series whatever the id is.
+
+        Args:
+            app: The ASGI app to measure
+        """
+
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started_at = time.perf_counter()
+        # Routing may rewrite it, in mounted apps
+        path = scope["path"]
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+
+            labels = (method, route_template(scope, path), str(status))
+
+            REQUEST_COUNT.labels(*labels).inc()
+            REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - started_at)
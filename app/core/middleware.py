@@ -1,22 +1,140 @@
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+import hmac
+import math
+import time
+from http.cookies import SimpleCookie
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.config import get_settings
+from app.core.database import ReadYourWrites, read_your_writes
+
+EXEMPT_PATHS = frozenset({"/docs", "/openapi.json", "/health", "/redoc"})
+
+METRICS_PATH = "/metrics"
+
+API_KEY_HEADER = b"x-api-key"
+
+UNAUTHORIZED_BODY = b'{"detail": "Invalid or missing API key"}'
+
+PRIMARY_COOKIE = "primary_until"
+
+
+class APIKeyMiddleware:
+    def __init__(self, app: ASGIApp, api_key: Optional[str] = None):
+        """
+        Reject requests that don't carry the configured API key.
+
+        This is a plain ASGI middleware: authorized requests are handed to
+        the app untouched, so streaming responses and cancellation behave
+        exactly as if there was no middleware at all.
+
+        Args:
+            app: The ASGI app to protect
+            api_key: The expected key, defaults to the one in the settings
+        """
+
+        settings = get_settings()
+
+        self.app = app
+        self.api_key = (api_key or settings.api_key).encode()
+        self.exempt_paths = EXEMPT_PATHS
+
+        # Scrapers use the metrics token instead, or nothing when metrics are public
+        if settings.metrics_token or settings.metrics_public:
+            self.exempt_paths = EXEMPT_PATHS | {METRICS_PATH}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        api_key = None
+
+        for name, value in scope["headers"]:
+            if name == API_KEY_HEADER:
+                api_key = value
+                break
+
+        # compare_digest takes the same time wherever the keys differ, so
+        # response timings don't leak how much of a guess was right
+        if api_key is None or not hmac.compare_digest(api_key, self.api_key):
+            await send({
+                "type": "http.response.start",
+                "status": 401,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(UNAUTHORIZED_BODY)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": UNAUTHORIZED_BODY})
+            return
+
+        await self.app(scope, receive, send)
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app: ASGIApp, window: Optional[float] = None):
+        """
+        Keep a client's reads on the primary for a while after it writes,
+        so it never reads from a replica that hasn't caught up yet.
+
+        A request that commits a write gets a cookie holding the time until
+        which its client is pinned to the primary; get_read_session honours
+        it, as well as writes made earlier in the same request.
+
+        Args:
+            app: The ASGI app to wrap
+            window: Seconds to stay on the primary after a write, defaults
+                to the one in the settings
+        """
+
+        self.app = app
+        self.window = get_settings().read_your_writes_window if window is None else window
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = ReadYourWrites(self._pinned_until(scope))
+        token = read_your_writes.set(state)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and state.wrote and self.window > 0:
+                pinned_until = int(time.time() + self.window) + 1
+                cookie = (
+                    f"{PRIMARY_COOKIE}={pinned_until}; Max-Age={int(self.window) + 1}; "
+                    f"Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())],
+                }
+
+            await send(message)
 
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            read_your_writes.reset(token)
 
-class APIKeyMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+    def _pinned_until(self, scope: Scope) -> float:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                morsel = SimpleCookie(value.decode("latin-1")).get(PRIMARY_COOKIE)
 
-        if request.url.path in ["/docs", "/openapi.json", "/health", "/redoc"]:
-            return await call_next(request)
+                if morsel is not None:
+                    try:
+                        pinned_until = float(morsel.value)
+                    except ValueError:
+                        return 0.0
 
-        api_key = request.headers.get("X-API-Key")
+                    if not math.isfinite(pinned_until):
+                        return 0.0
 
-        if not api_key or api_key != get_settings().api_key:
-            return Response(
-                content='{"detail": "Invalid or missing API key"}',
-                status_code=401,
-                media_type="application/json"
-            )
+                    # The cookie comes from the client: it can't pin it to
+                    # the primary for longer than one of ours would
+                    return min(pinned_until, time.time() + self.window + 1)
 
-        return await call_next(request)
+        return 0.0
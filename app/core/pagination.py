@@ -0,0 +1,197 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Generic, List, Optional, Sequence, Tuple, TypeVar
+from uuid import UUID
+
+from fastapi import Query
+from pydantic import BaseModel
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Lists embedded in an entity read (a project's members, a company's users)
+# hold their first page only, the rest is read through the list endpoints
+EMBED_LIMIT = 100
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class PageParams(BaseModel):
+    limit: int = DEFAULT_PAGE_SIZE
+    cursor: Optional[str] = None
+
+
+def get_page_params(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+) -> PageParams:
+    return PageParams(limit=limit, cursor=cursor)
+
+
+def coerce_column_value(column, value: Any) -> Any:
+    """
+    Convert a JSON-decoded value back into the Python type of a column.
+
+    Args:
+        column: The SQLAlchemy column the value belongs to
+        value: The decoded value (usually a string)
+
+    Returns:
+        The value converted to the column's Python type
+    """
+
+    if value is None:
+        return None
+
+    python_type = column.type.python_type
+
+    if isinstance(value, python_type):
+        return value
+
+    if python_type is UUID:
+        return UUID(value)
+
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+
+    return python_type(value)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode the sort key of the last row of a page into an opaque cursor.
+
+    Args:
+        values: The sort key values, in the same order as the sort columns
+
+    Returns:
+        A URL-safe cursor string
+    """
+
+    payload = json.dumps(
+        [value if isinstance(value, (int, float)) or value is None else str(value)
+         for value in values],
+        separators=(",", ":"),
+    )
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> Tuple[Any, ...]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: The opaque cursor sent by the client
+        columns: The sort columns the cursor was built from
+
+    Returns:
+        The sort key values converted to the columns' Python types
+
+    Raises:
+        ValueError: If the cursor is malformed or doesn't match the columns
+    """
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("Cursor doesn't match the sort columns")
+
+        return tuple(
+            coerce_column_value(column, value)
+            for column, value in zip(columns, values)
+        )
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+
+def apply_keyset(
+        query: Select,
+        columns: Sequence,
+        limit: int,
+        cursor: Optional[str] = None,
+) -> Select:
+    """
+    Restrict a query to the page that follows the given cursor.
+
+    One extra row is fetched so the caller can tell whether another
+    page exists without running a count query.
+
+    Args:
+        query: The base query, without ORDER BY or LIMIT
+        columns: The sort columns, the last one being a unique tie-breaker
+        limit: The page size
+        cursor: The cursor of the previous page, if any
+
+    Returns:
+        The query with the keyset predicate, ordering and limit applied
+    """
+
+    if cursor:
+        query = query.where(tuple_(*columns) > decode_cursor(cursor, columns))
+
+    return query.order_by(*columns).limit(limit + 1)
+
+
+async def paginate(
+        session: AsyncSession,
+        query: Select,
+        columns: Sequence,
+        limit: int,
+        cursor: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Run a keyset-paginated query.
+
+    Args:
+        session: The async database session to run the query on
+        query: The base query selecting a single ORM entity
+        columns: The sort columns, the last one being a unique tie-breaker
+        limit: The page size
+        cursor: The cursor of the previous page, if any
+
+    Returns:
+        The rows of the page and the cursor of the next page, or None
+        if this is the last page
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+
+    result = await session.execute(apply_keyset(query, columns, limit, cursor))
+
+    return split_page(list(result.scalars().all()), columns, limit)
+
+
+def split_page(rows: List[Any], columns: Sequence, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Cut the rows fetched by a query from apply_keyset down to the page.
+
+    Args:
+        rows: The rows, up to limit + 1 of them
+        columns: The sort columns the rows were ordered by
+        limit: The page size
+
+    Returns:
+        The rows of the page and the cursor of the next page, or None
+        if this is the last page
+    """
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
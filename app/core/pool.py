@@ -0,0 +1,100 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Sequence
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Seconds; a healthy pool hands out connections in well under a millisecond,
+# the upper buckets are there to show how close we get to pool_timeout
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        """
+        A cumulative histogram with fixed upper bounds, in the same shape
+        Prometheus uses, so the numbers can be compared across replicas.
+
+        Args:
+            buckets: The sorted upper bounds of the buckets, +Inf is implied
+        """
+
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        cumulative: List[int] = []
+        running = 0
+
+        for count in counts:
+            running += count
+            cumulative.append(running)
+
+        return {
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.buckets, cumulative)},
+                "+Inf": cumulative[-1],
+            },
+            "count": cumulative[-1],
+            "sum": total,
+        }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    The default asyncpg pool, recording how long every checkout waited for a
+    connection and how many of them gave up after pool_timeout.
+
+    The wait includes opening a new connection when the pool grows, which is
+    part of the latency a request sees anyway.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = Histogram(WAIT_BUCKETS)
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_time.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        # Keep the statistics when the engine replaces the pool after a
+        # disconnect, they describe the process rather than one pool object
+        pool = super().recreate()
+        pool.wait_time = self.wait_time
+        pool.timeouts = self.timeouts
+
+        return pool
+
+    def stats(self) -> Dict:
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "timeout": self.timeout(),
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait_time.snapshot(),
+        }
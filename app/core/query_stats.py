@@ -0,0 +1,141 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self):
+        """Statements executed, and the time spent on them, in a unit of work."""
+
+        self.count = 0
+        self.duration = 0.0
+        self.statements: List[str] = []
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements.append(statement)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        Statement shapes executed more than threshold times, a sign of N+1
+        queries. Statements are compared as SQL text with placeholders, so
+        the same query with different parameters counts as one shape.
+        """
+
+        return [
+            (statement, count)
+            for statement, count in Counter(self.statements).most_common()
+            if count > threshold
+        ]
+
+
+# Every collector in the tuple sees every statement, so a test can measure
+# a request that the middleware is measuring as well
+_collectors: ContextVar[Tuple[QueryStats, ...]] = ContextVar("query_stats", default=())
+
+
+def record_statement(statement: str, duration: float):
+    for stats in _collectors.get():
+        stats.record(statement, duration)
+
+
+@contextmanager
+def collect_queries() -> Iterator[QueryStats]:
+    """Collect the statements executed in the current context."""
+
+    stats = QueryStats()
+    token = _collectors.set((*_collectors.get(), stats))
+
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int) -> Iterator[QueryStats]:
+    """
+    Fail if the block runs more than max_queries statements, e.g.
+
+        with assert_max_queries(1):
+            response = await client.get(f"/api/v1/projects/{project_id}")
+
+    Args:
+        max_queries: The statement budget of the block
+
+    Raises:
+        AssertionError: If the budget was exceeded, listing the statements
+    """
+
+    with collect_queries() as stats:
+        yield stats
+
+    if stats.count > max_queries:
+        statements = "\n".join(f"  {statement}" for statement in stats.statements)
+
+        raise AssertionError(
+            f"Expected at most {max_queries} queries, {stats.count} were executed:\n{statements}"
+        )
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp, repeat_threshold: Optional[int] = None):
+        """
+        Count the statements of every request and the time spent on them.
+
+        Totals are sent in a Server-Timing header (shown by browser dev
+        tools), and a warning is logged when a request runs the same
+        statement shape more than repeat_threshold times.
+
+        Args:
+            app: The ASGI app to measure
+            repeat_threshold: Defaults to the one in the settings
+        """
+
+        self.app = app
+        self.repeat_threshold = (
+            get_settings().query_repeat_threshold if repeat_threshold is None else repeat_threshold
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+
+        with collect_queries() as stats:
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start":
+                    # Streaming responses keep querying after this point, so
+                    # for them the header only covers the work done up front
+                    server_timing = (
+                        f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.2f}, '
+                        f"app;dur={(time.perf_counter() - started_at) * 1000:.2f}"
+                    )
+                    message = {
+                        **message,
+                        "headers": [*message.get("headers", []), (b"server-timing", server_timing.encode())],
+                    }
+
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        for statement, count in stats.repeated(self.repeat_threshold):
+            route = scope.get("route")
+
+            logger.warning(
+                f"Possible N+1: {scope['method']} {route.path if route else scope['path']} "
+                f"ran this statement {count} times: {statement}"
+            )
@@ -0,0 +1,227 @@
+import json
+from typing import Optional, Sequence, Tuple
+
+from fastapi import Response
+from sqlalchemy import Select, Text, cast, func, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.pagination import apply_keyset, encode_cursor
+
+
+class RawJSONResponse(Response):
+    """A response whose body is JSON that was already rendered elsewhere."""
+
+    media_type = "application/json"
+
+
+def renders_in_db(endpoint: str) -> bool:
+    """
+    Whether an endpoint should serve documents rendered by Postgres instead
+    of going through the ORM and Pydantic.
+
+    Args:
+        endpoint: The endpoint name, e.g. "projects.detail"
+
+    Returns:
+        True if the endpoint is listed in the db_json_endpoints setting
+    """
+
+    return endpoint in get_settings().db_json_endpoints
+
+
+def json_object(**fields):
+    """
+    Build a json_build_object() expression.
+
+    Keys are inlined rather than bound, and keep the order they are given
+    in, which should match the field order of the equivalent Pydantic
+    schema.
+
+    Args:
+        fields: The JSON keys and the SQL expressions they map to
+
+    Returns:
+        A SQL expression evaluating to the JSON object
+    """
+
+    arguments = []
+
+    for key, value in fields.items():
+        arguments.extend((literal_column(f"'{key}'"), value))
+
+    return func.json_build_object(*arguments)
+
+
+def as_text(document):
+    """Cast a JSON expression to text, so it reaches Python unparsed."""
+
+    return cast(document, Text)
+
+
+async def fetch_json(session: AsyncSession, query: Select) -> Optional[bytes]:
+    """
+    Run a query selecting a single JSON document.
+
+    Args:
+        session: The async database session to run the query on
+        query: A query whose first column is the document, as text
+
+    Returns:
+        The document, or None if the query returned no row
+    """
+
+    result = await session.execute(query)
+    document = result.scalar_one_or_none()
+
+    return document.encode() if document is not None else None
+
+
+async def fetch_page_json(
+        session: AsyncSession,
+        query: Select,
+        columns: Sequence,
+        limit: int,
+        cursor: Optional[str] = None,
+) -> Tuple[bytes, Optional[str]]:
+    """
+    Run a keyset-paginated query whose rows are rendered to JSON by Postgres.
+
+    Args:
+        session: The async database session to run the query on
+        query: A query selecting the row document as text, followed by
+            the sort columns
+        columns: The sort columns, the last one being a unique tie-breaker
+        limit: The page size
+        cursor: The cursor of the previous page, if any
+
+    Returns:
+        The row documents joined by commas, ready to go between brackets,
+        and the cursor of the next page, or None if this is the last page
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+
+    result = await session.execute(apply_keyset(query, columns, limit, cursor))
+    rows = result.all()
+    next_cursor = None
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1:])
+
+    return ",".join(row[0] for row in rows).encode(), next_cursor
+
+
+async def paginate_json(
+        session: AsyncSession,
+        query: Select,
+        columns: Sequence,
+        limit: int,
+        cursor: Optional[str] = None,
+) -> bytes:
+    """
+    Same as fetch_page_json, with the rows assembled into a page document.
+
+    Returns:
+        The page, shaped like pagination.Page, as JSON bytes
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+
+    items, next_cursor = await fetch_page_json(session, query, columns, limit, cursor)
+
+    return b"".join((
+        b'{"items":[',
+        items,
+        b'],"next_cursor":',
+        json.dumps(next_cursor).encode(),
+        b"}",
+    ))
+
+
+def page_lateral(query: Select, columns: Sequence, limit: int, name: str):
+    """
+    LATERAL subquery with the first page of a list to embed in a JSON
+    object, one row more than the page to tell whether another page exists.
+
+    Args:
+        query: A query selecting the row document, labelled "document",
+            followed by the sort columns, correlated to the entity
+        columns: The sort columns, the last one being a unique tie-breaker
+        limit: The page size
+        name: The name of the subquery
+
+    Returns:
+        The subquery, whose rows also have their 1-based position
+    """
+
+    position = func.row_number().over(order_by=list(columns)).label("position")
+
+    return apply_keyset(query.add_columns(position), columns, limit).lateral(name)
+
+
+def aggregate_page(page, limit: int):
+    """
+    JSON array of the documents of a page_lateral, in order, without the
+    extra row. The query has to group by the entity's primary key.
+    """
+
+    return func.coalesce(
+        func.json_agg(aggregate_order_by(page.c.document, page.c.position))
+        .filter(page.c.position <= limit),
+        literal_column("'[]'::json")
+    )
+
+
+async def fetch_json_with_page(
+        session: AsyncSession,
+        query: Select,
+        name: str,
+        page,
+        columns: Sequence,
+        limit: int,
+) -> Optional[Tuple[bytes, int]]:
+    """
+    Run a query selecting a single JSON object that embeds a page_lateral
+    through aggregate_page, and add the cursor of the next page to it.
+
+    The key of the last row of the page comes with the same row, so the
+    object and its list are read in one statement.
+
+    Args:
+        session: The async database session to run the query on
+        query: A query whose first column is the object, as text
+        name: The key of the embedded list
+        page: The page_lateral joined to the entity
+        columns: The sort columns of the page
+        limit: The page size
+
+    Returns:
+        The object with <name>_next_cursor added, and the number of
+        rows embedded in it; None if the query returned no row
+    """
+
+    last = [
+        func.max(cast(page.c[column.key], Text)).filter(page.c.position == limit)
+        for column in columns
+    ]
+    result = await session.execute(query.add_columns(func.count(page.c.position), *last))
+    row = result.one_or_none()
+
+    if row is None:
+        return None
+
+    text, count, *key = row
+    document = text.encode()
+    next_cursor = encode_cursor(key) if count > limit else None
+
+    return b"".join((
+        document[:document.rindex(b"}")],
+        f', "{name}_next_cursor" : '.encode(),
+        json.dumps(next_cursor).encode(),
+        b"}",
+    )), min(count, limit)
@@ -0,0 +1,106 @@
+import sys
+from typing import Generic, List, TypeVar
+
+from fastapi import Query
+from pydantic import BaseModel
+from sqlalchemy import Float, Select, String, and_, func, literal, select, union_all
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_LENGTH = 100
+
+# Below this, a query has too few trigrams for fuzzy matching to mean much,
+# only prefix matches are looked for
+MIN_FUZZY_LENGTH = 3
+
+T = TypeVar("T")
+
+
+class SearchResults(BaseModel, Generic[T]):
+    items: List[T]
+
+
+class SearchParams(BaseModel):
+    q: str
+    limit: int = DEFAULT_SEARCH_LIMIT
+
+
+def get_search_params(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+) -> SearchParams:
+    return SearchParams(q=q, limit=limit)
+
+
+def starts_with(column, prefix: str):
+    """
+    Case-insensitive prefix match, served by an index on
+    `lower(column) text_pattern_ops`.
+
+    The prefix is compared as a range with the pattern operators rather
+    than with `LIKE 'prefix%'`: LIKE only uses the index when the pattern
+    is known at plan time, which isn't the case in the generic plan of a
+    prepared statement.
+    """
+
+    lowered = func.lower(column)
+    lower_bound = prefix.lower()
+    condition = lowered.op("~>=~", is_comparison=True)(literal(lower_bound, String))
+
+    if ord(lower_bound[-1]) < sys.maxunicode:
+        upper_bound = lower_bound[:-1] + chr(ord(lower_bound[-1]) + 1)
+        condition = and_(condition, lowered.op("~<~", is_comparison=True)(literal(upper_bound, String)))
+
+    return condition
+
+
+def pattern_order(column):
+    """ORDER BY lower(column) in the order of its text_pattern_ops index."""
+
+    return UnaryExpression(func.lower(column), modifier=operators.custom_op("USING ~<~"))
+
+
+def fuzzy_match(query: str, column):
+    """`query <% column`: some part of the column looks like the query (pg_trgm)."""
+
+    return literal(query, String).op("<%", is_comparison=True)(column)
+
+
+def word_similarity(query: str, column):
+    """How well the query matches the most similar part of the column, 0 to 1."""
+
+    return func.word_similarity(literal(query, String), column)
+
+
+def word_distance(query: str, column):
+    """1 - word_similarity, the ordering a GiST trigram index can scan by."""
+
+    return literal(query, String).op("<<->", return_type=Float)(column)
+
+
+def rank_matches(*branches: Select):
+    """
+    Merge the candidates of several searches into one ranking.
+
+    Each branch selects (id, prefix, score) for at most limit rows: prefix
+    is 1 for prefix matches and 0 otherwise, score is a similarity from 0
+    to 1. An entity found by several branches keeps its best of each.
+
+    Returns:
+        A subquery of (id, prefix, score), one row per entity, to join on
+        the entity and order by prefix then score, both descending
+    """
+
+    matches = union_all(*branches).subquery("matches")
+
+    return (
+        select(
+            matches.c.id,
+            func.max(matches.c.prefix).label("prefix"),
+            func.max(matches.c.score).label("score")
+        )
+        .group_by(matches.c.id)
+        .subquery("ranked")
+    )
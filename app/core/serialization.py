@@ -0,0 +1,170 @@
+from typing import Any, Iterable, List, Mapping, Optional, Type, TypeVar, Union
+from uuid import UUID
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+from app.core.batch import Batch
+from app.core.config import get_settings
+from app.core.pagination import Page
+from app.core.search import SearchResults
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        # Runs the model's compiled pydantic-core serializer, no validation
+        return value.model_dump()
+
+    if isinstance(value, UUID):
+        # asyncpg returns its own UUID subclass, which orjson doesn't encode
+        return str(value)
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any, option: int = 0) -> bytes:
+    """
+    Encode content to JSON with orjson, models and database values included.
+
+    Args:
+        content: What to encode: models, ORM attribute values, rows...
+        option: orjson options, e.g. orjson.OPT_APPEND_NEWLINE
+
+    Returns:
+        The JSON bytes
+    """
+
+    return orjson.dumps(content, default=_default, option=option)
+
+
+class TrustedJSONResponse(Response):
+    """JSON response encoded with orjson, without validating the content."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def trusted_serialization() -> bool:
+    return get_settings().trusted_serialization
+
+
+def build(model: Type[M], obj: Any = None, **values: Any) -> M:
+    """
+    Build a response model from an ORM object and/or explicit values.
+
+    In trusted mode the model is built with model_construct: data that
+    comes from our own database has already been validated on the way
+    in, so it isn't parsed again.
+
+    Args:
+        model: The response model to build
+        obj: An object to read the model's fields from, if any
+        values: Field values, taking precedence over the object's attributes
+
+    Returns:
+        The response model
+    """
+
+    if obj is not None:
+        values = {
+            **{
+                name: getattr(obj, name)
+                for name in model.model_fields
+                if name not in values
+            },
+            **values
+        }
+
+    if trusted_serialization():
+        return model.model_construct(**values)
+
+    return model.model_validate(values)
+
+
+def build_page(model: Type[M], objs: Iterable[Any], next_cursor: Optional[str]) -> Page[M]:
+    """
+    Build a page of response models from ORM objects.
+
+    Args:
+        model: The response model of the page items
+        objs: The objects to build the items from
+        next_cursor: The cursor of the next page
+
+    Returns:
+        The page
+    """
+
+    return build(
+        Page[model],
+        items=[build(model, obj) for obj in objs],
+        next_cursor=next_cursor
+    )
+
+
+def build_batch(model: Type[M], objs: Iterable[Any], missing: List[UUID]) -> Batch[M]:
+    """
+    Build the result of a multi-get from ORM objects.
+
+    Args:
+        model: The response model of the items
+        objs: The objects found
+        missing: The requested ids that weren't found
+
+    Returns:
+        The batch
+    """
+
+    return build(
+        Batch[model],
+        items=[build(model, obj) for obj in objs],
+        missing=missing
+    )
+
+
+def build_results(model: Type[M], objs: Iterable[Any]) -> SearchResults[M]:
+    """
+    Build search results from ORM objects, kept in their ranking order.
+
+    Args:
+        model: The response model of the items
+        objs: The objects found, best match first
+
+    Returns:
+        The search results
+    """
+
+    return build(SearchResults[model], items=[build(model, obj) for obj in objs])
+
+
+def respond(
+        content: BaseModel,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None
+) -> Union[BaseModel, Response]:
+    """
+    Turn a response model into what a route should return.
+
+    In trusted mode the model is encoded right away, which also skips
+    FastAPI's response_model validation. Otherwise the model is returned as
+    is and goes through response_model like any other return value. The
+    route's response_model is kept either way for the OpenAPI schema.
+
+    Args:
+        content: The response model
+        status_code: The status code, must match the route's status_code
+        headers: Extra headers, must also be set on the route's injected
+            Response for the non-trusted mode
+
+    Returns:
+        A response in trusted mode, the model otherwise
+    """
+
+    if trusted_serialization():
+        return TrustedJSONResponse(content, status_code=status_code, headers=headers)
+
+    return content
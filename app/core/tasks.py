@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    def __init__(
+            self,
+            name: str,
+            interval: float,
+            func: Callable[[], Awaitable[object]]
+    ):
+        """
+        Run a coroutine function in the background on a fixed interval.
+
+        Args:
+            name: A name for logs
+            interval: Seconds to wait between the end of a run and the next one
+            func: The coroutine function to run
+        """
+
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.func()
+            except Exception:
+                # A failed run must not kill the loop, the next one may succeed
+                logger.exception(f"Periodic task {self.name} failed")
+
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,68 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import BigInteger, DateTime, Float, ForeignKey, SmallInteger, String
+from sqlalchemy.dialects.postgresql import UUID as pgUUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+# These tables are maintained by database triggers (see the platform counters
+# and analytics rollups migrations), the application only ever reads them.
+class PlatformCounter(Base):
+    __tablename__ = "platform_counters"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    slot: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+
+
+class CompanyCounter(Base):
+    __tablename__ = "company_counters"
+
+    company_id: Mapped[UUID] = mapped_column(
+        pgUUID(as_uuid=True),
+        ForeignKey("companies.id", ondelete="CASCADE"),
+        primary_key=True)
+    users: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+    projects: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+    memberships: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+
+
+class ProjectCounter(Base):
+    __tablename__ = "project_counters"
+
+    project_id: Mapped[UUID] = mapped_column(
+        pgUUID(as_uuid=True),
+        ForeignKey("projects.id", ondelete="CASCADE"),
+        primary_key=True)
+    members: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+
+
+class AnalyticsRollup(Base):
+    __tablename__ = "analytics_rollups"
+
+    metric: Mapped[str] = mapped_column(String, primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    slot: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    total: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
+# Materialized view, refreshed periodically (see refresh_company_stats). The
+# is_view marker keeps alembic autogenerate from creating it as a table.
+class CompanyStats(Base):
+    __tablename__ = "company_stats"
+    __table_args__ = {"info": {"is_view": True}}
+
+    company_id: Mapped[UUID] = mapped_column(pgUUID(as_uuid=True), primary_key=True)
+    name: Mapped[str] = mapped_column(String)
+    domain: Mapped[str] = mapped_column(String)
+    users: Mapped[int] = mapped_column(BigInteger)
+    projects: Mapped[int] = mapped_column(BigInteger)
+    memberships: Mapped[int] = mapped_column(BigInteger)
+    avg_members_per_project: Mapped[float] = mapped_column(Float)
+    users_rank: Mapped[int] = mapped_column(BigInteger)
+    projects_rank: Mapped[int] = mapped_column(BigInteger)
+    memberships_rank: Mapped[int] = mapped_column(BigInteger)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
@@ -1,17 +1,110 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
 
-from app.core.database import get_session
-from app.features.analytics.schema import AnalyticsResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from app.core.config import get_settings
+from app.core.dependencies import get_analytics_service
+from app.core.pagination import Page, PageParams, get_page_params
+from app.core.serialization import build, build_page, respond
+from app.features.analytics.schema import (
+    AnalyticsResponse,
+    AnalyticsSource,
+    CompanyStatsResponse,
+    CompanyStatsSort,
+    TimeseriesBucket,
+    TimeseriesMetric,
+    TimeseriesResponse
+)
 from app.features.analytics.service import AnalyticsService
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.features.analytics.snapshot import analytics_snapshot
 
 router = APIRouter()
 
 
 @router.get("/analytics", response_model=AnalyticsResponse)
-async def get_analytics(db: AsyncSession = Depends(get_session)):
-    service = AnalyticsService(db)
+async def get_analytics(
+    response: Response,
+    source: AnalyticsSource = AnalyticsSource.SNAPSHOT,
+    refresh: bool = False,
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
+    if source == AnalyticsSource.SNAPSHOT:
+        interval = get_settings().analytics_snapshot_interval
+
+        if refresh:
+            analytics = await analytics_snapshot.refresh()
+        else:
+            # The background task keeps the snapshot younger than the interval,
+            # anything much older means it isn't running
+            analytics = await analytics_snapshot.get(max_age=2 * interval)
+        max_age = max(0, int(interval - analytics.age_seconds))
+
+        response.headers["Cache-Control"] = (
+            f"public, max-age={max_age}, stale-while-revalidate={int(interval)}"
+        )
+
+        return respond(analytics, headers=response.headers)
+
+    if source == AnalyticsSource.COUNTERS:
+        analytics = await analytics_service.get_counter_analytics()
+    else:
+        analytics = await analytics_service.get_platform_analytics()
+
+    response.headers["Cache-Control"] = "no-store"
+
+    return respond(
+        analytics.model_copy(
+            update={"generated_at": datetime.now(timezone.utc), "age_seconds": 0.0}
+        ),
+        headers=response.headers
+    )
+
+
+@router.get("/analytics/timeseries", response_model=TimeseriesResponse)
+async def get_timeseries(
+    metric: TimeseriesMetric,
+    bucket: TimeseriesBucket = TimeseriesBucket.DAY,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=30)
+
+    try:
+        points = await analytics_service.get_timeseries(metric, bucket, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return respond(build(TimeseriesResponse, metric=metric, bucket=bucket, points=points))
+
+
+@router.get("/analytics/companies", response_model=Page[CompanyStatsResponse])
+async def list_company_stats(
+    sort: CompanyStatsSort = CompanyStatsSort.MEMBERSHIPS,
+    page: PageParams = Depends(get_page_params),
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
+    try:
+        stats, next_cursor = await analytics_service.get_company_stats_page(
+            sort, page.limit, page.cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return respond(build_page(CompanyStatsResponse, stats, next_cursor))
+
+
+@router.get("/analytics/companies/{company_id}",
+            response_model=CompanyStatsResponse)
+async def get_company_stats(
+    company_id: UUID,
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
+    company_stats = await analytics_service.get_company_stats(company_id)
 
-    analytics = await service.get_platform_analytics()
+    if not company_stats:
+        raise HTTPException(status_code=404, detail="Company stats not found")
 
-    return analytics
+    return respond(build(CompanyStatsResponse, company_stats))
@@ -1,6 +1,17 @@
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+from uuid import UUID
+
 from pydantic import BaseModel
 
 
+class AnalyticsSource(str, Enum):
+    LIVE = "live"
+    COUNTERS = "counters"
+    SNAPSHOT = "snapshot"
+
+
 class AnalyticsResponse(BaseModel):
     total_companies: int
     total_users: int
@@ -9,3 +20,48 @@ class AnalyticsResponse(BaseModel):
     avg_users_per_company: float
     avg_projects_per_company: float
     avg_members_per_project: float
+    generated_at: Optional[datetime] = None
+    age_seconds: Optional[float] = None
+
+
+class TimeseriesMetric(str, Enum):
+    USERS = "users"
+    PROJECTS = "projects"
+    MEMBERSHIPS = "memberships"
+
+
+class TimeseriesBucket(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+
+
+class TimeseriesPoint(BaseModel):
+    bucket_start: datetime
+    count: int
+
+
+class TimeseriesResponse(BaseModel):
+    metric: TimeseriesMetric
+    bucket: TimeseriesBucket
+    points: List[TimeseriesPoint]
+
+
+class CompanyStatsSort(str, Enum):
+    USERS = "users"
+    PROJECTS = "projects"
+    MEMBERSHIPS = "memberships"
+
+
+class CompanyStatsResponse(BaseModel):
+    company_id: UUID
+    name: str
+    domain: str
+    users: int
+    projects: int
+    memberships: int
+    avg_members_per_project: float
+    users_rank: int
+    projects_rank: int
+    memberships_rank: int
+    refreshed_at: datetime
@@ -1,11 +1,61 @@
-from sqlalchemy import func, select
-from app.features.analytics.schema import AnalyticsResponse
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, literal_column, select, text
+from app.core.pagination import DEFAULT_PAGE_SIZE, paginate
+from app.core.metrics import instrument_service
+from app.features.analytics.models import AnalyticsRollup, CompanyStats, PlatformCounter
+from app.features.analytics.schema import (
+    AnalyticsResponse,
+    CompanyStatsSort,
+    TimeseriesBucket,
+    TimeseriesMetric,
+    TimeseriesPoint
+)
 from app.features.companies.models import Company
 from app.features.projects.models import Project, ProjectMembership
 from app.features.users.models import User
 from sqlalchemy.ext.asyncio import AsyncSession
 
+MAX_TIMESERIES_POINTS = 10_000
 
+# Arbitrary key for the advisory lock that keeps app replicas from
+# refreshing company_stats at the same time
+COMPANY_STATS_REFRESH_LOCK = 719_204_113
+
+BUCKET_STEPS = {
+    TimeseriesBucket.HOUR: timedelta(hours=1),
+    TimeseriesBucket.DAY: timedelta(days=1),
+    TimeseriesBucket.WEEK: timedelta(weeks=1),
+}
+
+
+def truncate_to_bucket(moment: datetime, bucket: TimeseriesBucket) -> datetime:
+    """
+    Truncate a moment to the start of its UTC bucket, the same way Postgres'
+    date_trunc(bucket, moment, 'UTC') does (weeks start on Monday).
+
+    Naive datetimes are assumed to be in UTC.
+    """
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+
+    moment = moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    if bucket == TimeseriesBucket.HOUR:
+        return moment
+
+    day = moment.replace(hour=0)
+
+    if bucket == TimeseriesBucket.DAY:
+        return day
+
+    return day - timedelta(days=day.weekday())
+
+
+@instrument_service
 class AnalyticsService:
     def __init__(self, session: AsyncSession):
         """
@@ -32,103 +82,267 @@ class AnalyticsService:
             - Average members per project
         """
 
-        companies_count = await self._get_count(Company)
-        users_count = await self._get_count(User)
-        projects_count = await self._get_count(Project)
-        memberships_count = await self._get_count(ProjectMembership)
+        users_per_company = (
+            select(func.count().label("total"))
+            .select_from(User)
+            .group_by(User.company_id)
+        ).cte("users_per_company")
+
+        projects_per_company = (
+            select(func.count().label("total"))
+            .select_from(Project)
+            .group_by(Project.company_id)
+        ).cte("projects_per_company")
 
-        avg_users_per_company = await self._get_avg_users_per_company()
-        avg_projects_per_company = await self._get_avg_projects_per_company()
-        avg_members_per_project = await self._get_avg_members_per_project()
+        members_per_project = (
+            select(func.count().label("total"))
+            .select_from(ProjectMembership)
+            .group_by(ProjectMembership.project_id)
+        ).cte("members_per_project")
 
-        return AnalyticsResponse(
-            total_companies=companies_count,
-            total_users=users_count,
-            total_projects=projects_count,
-            total_memberships=memberships_count,
-            avg_users_per_company=avg_users_per_company,
-            avg_projects_per_company=avg_projects_per_company,
-            avg_members_per_project=avg_members_per_project
+        # Each grouped CTE is referenced twice (sum and average), so Postgres
+        # materializes it once: every table is scanned a single time and all
+        # the metrics come back in one round trip.
+        result = await self.session.execute(
+            select(
+                self._scalar(func.count(), Company),
+                self._scalar(func.sum(users_per_company.c.total)),
+                self._scalar(func.sum(projects_per_company.c.total)),
+                self._scalar(func.sum(members_per_project.c.total)),
+                self._scalar(func.avg(users_per_company.c.total)),
+                self._scalar(func.avg(projects_per_company.c.total)),
+                self._scalar(func.avg(members_per_project.c.total)),
+            )
         )
 
+        (
+            companies_count,
+            users_count,
+            projects_count,
+            memberships_count,
+            avg_users_per_company,
+            avg_projects_per_company,
+            avg_members_per_project
+        ) = result.one()
 
-    async def _get_count(self, model) -> int:
+        return AnalyticsResponse(
+            total_companies=int(companies_count),
+            total_users=int(users_count),
+            total_projects=int(projects_count),
+            total_memberships=int(memberships_count),
+            avg_users_per_company=float(avg_users_per_company),
+            avg_projects_per_company=float(avg_projects_per_company),
+            avg_members_per_project=float(avg_members_per_project)
+        )
+
+    async def get_counter_analytics(self) -> AnalyticsResponse:
         """
-        Get the total number of records for a given model.
+        Read platform analytics from the trigger-maintained counters.
 
-        Args:
-            model: The SQLAlchemy model class to count
+        This costs the same regardless of how many rows the platform has,
+        at the price of trusting the counters (see rebuild_counters).
 
         Returns:
-            The total number of records for this model
+            AnalyticsResponse with the same metrics as get_platform_analytics
         """
 
-        result = await self.session.execute(select(func.count(model.id)))
+        result = await self.session.execute(
+            select(PlatformCounter.name, func.sum(PlatformCounter.value))
+            .group_by(PlatformCounter.name)
+        )
+
+        counters = {name: int(value) for name, value in result.all()}
 
-        return result.scalar_one()
+        return AnalyticsResponse(
+            total_companies=counters.get("companies", 0),
+            total_users=counters.get("users", 0),
+            total_projects=counters.get("projects", 0),
+            total_memberships=counters.get("memberships", 0),
+            avg_users_per_company=self._ratio(
+                counters, "users", "companies_with_users"),
+            avg_projects_per_company=self._ratio(
+                counters, "projects", "companies_with_projects"),
+            avg_members_per_project=self._ratio(
+                counters, "memberships", "projects_with_members")
+        )
 
-    async def _get_avg_users_per_company(self) -> float:
+    async def get_timeseries(
+            self,
+            metric: TimeseriesMetric,
+            bucket: TimeseriesBucket,
+            start: datetime,
+            end: datetime
+    ) -> List[TimeseriesPoint]:
         """
-        Calculate the average number of users per company.
+        Count the rows created per time bucket, from the hourly rollups.
+
+        Only the rollup rows of the requested range are read, so the cost
+        depends on the range and not on the size of the counted table.
+
+        Args:
+            metric: What to count
+            bucket: The bucket size
+            start: Start of the range, rounded down to its bucket
+            end: End of the range (exclusive)
 
         Returns:
-            The average number of users per company, or 0.0 if no companies exist
+            One point per bucket in the range, including empty buckets
+
+        Raises:
+            ValueError: If the range is empty or has too many buckets
         """
 
-        subquery = (
-            select(func.count(User.id).label('user_count'))
-            .select_from(User)
-            .group_by(User.company_id)
-        ).subquery()
+        first_bucket = truncate_to_bucket(start, bucket)
+        step = BUCKET_STEPS[bucket]
+
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+
+        if end <= first_bucket:
+            raise ValueError("The end of the range must be after its start")
+
+        if (end - first_bucket) / step > MAX_TIMESERIES_POINTS:
+            raise ValueError(
+                f"The range can't span more than {MAX_TIMESERIES_POINTS} buckets")
+
+        # Inlined rather than bound, otherwise the SELECT and GROUP BY
+        # expressions get different parameters and Postgres rejects them
+        bucket_start = func.date_trunc(
+            literal_column(f"'{bucket.value}'"),
+            AnalyticsRollup.bucket_start,
+            literal_column("'UTC'")
+        )
 
         result = await self.session.execute(
-            select(func.avg(subquery.c.user_count))
+            select(bucket_start, func.sum(AnalyticsRollup.total))
+            .where(
+                AnalyticsRollup.metric == metric.value,
+                AnalyticsRollup.bucket_start >= first_bucket,
+                AnalyticsRollup.bucket_start < end
+            )
+            .group_by(bucket_start)
         )
 
-        avg = result.scalar()
+        totals = {moment: int(total) for moment, total in result.all()}
 
-        return float(avg) if avg else 0.0
+        points = []
+        moment = first_bucket
 
-    async def _get_avg_projects_per_company(self) -> float:
+        while moment < end:
+            points.append(TimeseriesPoint(bucket_start=moment, count=totals.get(moment, 0)))
+            moment += step
+
+        return points
+
+    async def get_company_stats_page(
+            self,
+            sort: CompanyStatsSort = CompanyStatsSort.MEMBERSHIPS,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None
+    ) -> Tuple[List[CompanyStats], Optional[str]]:
         """
-        Calculate the average number of projects per company.
+        Get a page of the per-company stats leaderboard.
+
+        Args:
+            sort: The metric companies are ranked by, highest first
+            limit: The maximum number of companies to return
+            cursor: The cursor returned with the previous page, if any
 
         Returns:
-            The average number of projects per company, or 0.0 if no companies exist
+            The company stats of the page and the cursor of the next page,
+            or None if this is the last page
+
+        Raises:
+            ValueError: If the cursor is invalid
         """
 
-        subquery = (
-            select(func.count(Project.id).label('project_count'))
-            .select_from(Project)
-            .group_by(Project.company_id)
-        ).subquery()
+        rank = getattr(CompanyStats, f"{sort.value}_rank")
 
-        result = await self.session.execute(
-            select(func.avg(subquery.c.project_count))
+        return await paginate(
+            self.session,
+            select(CompanyStats),
+            (rank, CompanyStats.company_id),
+            limit,
+            cursor
         )
 
-        avg = result.scalar()
+    async def get_company_stats(self, company_id: UUID) -> Optional[CompanyStats]:
+        """
+        Get the stats of a single company.
 
-        return float(avg) if avg else 0.0
+        Args:
+            company_id: The company to get stats for
 
-    async def _get_avg_members_per_project(self) -> float:
+        Returns:
+            The company stats as of the last refresh, or None if the company
+            didn't exist at that time
         """
-        Calculate the average number of members per project.
 
-        Returns:
-            The average number of members per project, or 0.0 if no projects exist
+        result = await self.session.execute(
+            select(CompanyStats).where(CompanyStats.company_id == company_id)
+        )
+
+        return result.scalar_one_or_none()
+
+    async def refresh_company_stats(self) -> bool:
         """
+        Refresh the company stats materialized view without blocking readers.
 
-        subquery = (
-            select(func.count(ProjectMembership.id).label('member_count'))
-            .select_from(ProjectMembership)
-            .group_by(ProjectMembership.project_id)
-        ).subquery()
+        Returns:
+            True if the view was refreshed, False if another process was
+            already refreshing it
+        """
 
-        result = await self.session.execute(
-            select(func.avg(subquery.c.member_count))
+        locked = await self.session.scalar(
+            select(func.pg_try_advisory_xact_lock(COMPANY_STATS_REFRESH_LOCK))
         )
 
-        avg = result.scalar()
+        if locked:
+            await self.session.execute(
+                text("REFRESH MATERIALIZED VIEW CONCURRENTLY company_stats")
+            )
+
+        await self.session.commit()
+
+        return bool(locked)
+
+    async def rebuild_counters(self):
+        """
+        Recompute every counter from the source tables.
+
+        Writes to the counted tables are blocked while the rebuild runs.
+        """
+
+        await self.session.execute(select(func.rebuild_counters()))
+        await self.session.commit()
+
+    @staticmethod
+    def _ratio(counters: Dict[str, int], total: str, groups: str) -> float:
+        """
+        Average a total over the number of groups that have at least one row,
+        matching the averages computed by get_platform_analytics.
+        """
+
+        return counters[total] / counters[groups] if counters.get(groups) else 0.0
+
+    @staticmethod
+    def _scalar(aggregate, model=None):
+        """
+        Wrap an aggregate into a scalar subquery that defaults to zero.
+
+        Args:
+            aggregate: The aggregate expression to compute
+            model: The model to select from, when the aggregate doesn't
+                reference a CTE column
+
+        Returns:
+            A scalar subquery evaluating to the aggregate, or 0 when there
+            are no rows
+        """
+
+        query = select(func.coalesce(aggregate, 0))
+
+        if model is not None:
+            query = query.select_from(model)
 
-        return float(avg) if avg else 0.0
+        return query.scalar_subquery()
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.database import read_session_maker
+from app.features.analytics.schema import AnalyticsResponse
+from app.features.analytics.service import AnalyticsService
+
+
+class AnalyticsSnapshot:
+    def __init__(self):
+        """
+        In-memory copy of the platform analytics, refreshed in the background
+        so that requests never have to hit the database.
+        """
+
+        self._analytics: Optional[AnalyticsResponse] = None
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, max_age: float) -> AnalyticsResponse:
+        """
+        Get the current snapshot.
+
+        The snapshot is recomputed synchronously if there is none yet, or if
+        it's older than max_age (e.g. the background refresh is failing).
+
+        Args:
+            max_age: The maximum acceptable age of the snapshot, in seconds
+
+        Returns:
+            The snapshot, with age_seconds set to its current age
+        """
+
+        if self._analytics is None or time.monotonic() - self._refreshed_at > max_age:
+            return await self.refresh()
+
+        return self._with_age()
+
+    async def refresh(self) -> AnalyticsResponse:
+        """
+        Recompute the snapshot.
+
+        Concurrent callers share a single recomputation: whoever waited on
+        the lock gets the snapshot that was just built instead of
+        building another one.
+
+        Returns:
+            The refreshed snapshot
+        """
+
+        requested_at = time.monotonic()
+
+        async with self._lock:
+            if self._analytics is None or self._refreshed_at < requested_at:
+                async with read_session_maker()() as session:
+                    analytics = await AnalyticsService(session).get_platform_analytics()
+
+                self._analytics = analytics.model_copy(
+                    update={"generated_at": datetime.now(timezone.utc)}
+                )
+                self._refreshed_at = time.monotonic()
+
+        return self._with_age()
+
+    def _with_age(self) -> AnalyticsResponse:
+        return self._analytics.model_copy(
+            update={"age_seconds": round(time.monotonic() - self._refreshed_at, 3)}
+        )
+
+
+analytics_snapshot = AnalyticsSnapshot()
@@ -0,0 +1,7 @@
+from app.core.database import async_session_maker
+from app.features.analytics.service import AnalyticsService
+
+
+async def refresh_company_stats():
+    async with async_session_maker() as session:
+        await AnalyticsService(session).refresh_company_stats()
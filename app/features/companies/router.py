@@ -1,6 +1,22 @@
-from typing import List
+from typing import List, Optional, Union
+
 from fastapi import APIRouter, Depends, HTTPException
-from app.core.dependencies import get_company_service
+from app.core.batch import Batch, get_batch_ids
+from app.core.cache import company_key, company_users_key, response_cache
+from app.core.coalescing import coalesce
+from app.core.dependencies import get_company_read_service, get_company_service
+from app.core.fieldsets import Fieldset, fieldset_params, pick
+from app.core.pagination import Page, PageParams, get_page_params
+from app.core.rendering import RawJSONResponse, renders_in_db
+from app.core.search import SearchParams, SearchResults, get_search_params
+from app.core.serialization import (
+    TrustedJSONResponse,
+    build,
+    build_batch,
+    build_page,
+    build_results,
+    respond
+)
 from app.features.companies.schemas import CompanyCreate, CompanyResponse, CompanyWithUsersResponse
 
 from app.features.companies.service import CompanyService
@@ -9,57 +25,116 @@ from uuid import UUID
 
 router = APIRouter()
 
+company_fieldset = fieldset_params(CompanyWithUsersResponse, includes=["users"], default_include=["users"])
+
 
-@router.get("/companies", response_model=List[CompanyResponse])
+@router.get("/companies",
+            response_model=Union[Batch[CompanyResponse], Page[CompanyResponse]])
 async def list_companies(
-    company_service: CompanyService = Depends(get_company_service),
+    ids: Optional[List[UUID]] = Depends(get_batch_ids),
+    page: PageParams = Depends(get_page_params),
+    company_service: CompanyService = Depends(get_company_read_service),
 ):
-    companies = await company_service.get_all_companies()
+    if ids is not None:
+        companies, missing = await company_service.get_companies_by_ids(ids)
+
+        return respond(build_batch(CompanyResponse, companies, missing))
 
-    return [
-        CompanyResponse.model_validate(
-            company,
-            from_attributes=True
-        ) for company in companies
-    ]
+    try:
+        if renders_in_db("companies.list"):
+            return RawJSONResponse(await company_service.get_all_companies_json(
+                page.limit, page.cursor))
+
+        companies, next_cursor = await company_service.get_all_companies(
+            page.limit, page.cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return respond(build_page(CompanyResponse, companies, next_cursor))
+
+
+# Declared before /companies/{company_id}, which would take "search" for an id
+@router.get("/companies/search", response_model=SearchResults[CompanyResponse])
+async def search_companies(
+    search: SearchParams = Depends(get_search_params),
+    company_service: CompanyService = Depends(get_company_read_service),
+):
+    companies = await company_service.search_companies(search.q, search.limit)
+
+    return respond(build_results(CompanyResponse, companies))
 
 
 @router.get("/companies/{company_id}", response_model=CompanyResponse)
+@coalesce("company_id")
 async def get_company(
     company_id: UUID,
-    company_service: CompanyService = Depends(get_company_service),
+    company_service: CompanyService = Depends(get_company_read_service),
 ):
-    company = await company_service.get_company_by_id(company_id)
+    async def render():
+        company = await company_service.get_company_by_id(company_id)
 
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
+        if not company:
+            raise HTTPException(status_code=404, detail="Company not found")
 
-    return CompanyResponse.model_validate(company, from_attributes=True)
+        return respond(build(CompanyResponse, company))
+
+    return await response_cache.fetch(company_key(company_id), render)
 
 
 @router.get("/companies/{company_id}/users",
             response_model=CompanyWithUsersResponse)
+@coalesce("company_id", "fieldset")
 async def get_company_users(
     company_id: UUID,
-    company_service: CompanyService = Depends(get_company_service),
+    fieldset: Fieldset = Depends(company_fieldset),
+    company_service: CompanyService = Depends(get_company_read_service),
 ):
-    company = await company_service.get_company_by_id(company_id)
+    async def render():
+        if renders_in_db("companies.users") and not fieldset.sparse:
+            rendered = await company_service.get_company_users_json(company_id)
+
+            if not rendered:
+                raise HTTPException(status_code=404, detail="Company not found")
+
+            document, has_users = rendered
+
+            if not has_users:
+                raise HTTPException(status_code=404,
+                                    detail="No users found for this company")
+
+            return RawJSONResponse(document)
+
+        found = await company_service.get_company_with(
+            company_id, fieldset.fields, fieldset.include)
+
+        if not found:
+            raise HTTPException(status_code=404, detail="Company not found")
+
+        company, company_users, users_next_cursor = found
+
+        if "users" in fieldset.include and not company_users:
+            raise HTTPException(status_code=404,
+                                detail="No users found for this company")
+
+        users = [build(UserResponse, user) for user in company_users]
+
+        if not fieldset.sparse:
+            return respond(build(
+                CompanyWithUsersResponse, company, users=users, users_next_cursor=users_next_cursor))
 
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
+        # Sparse documents don't match the response model, they are
+        # encoded as they are, in either serialization mode, with the
+        # encoder that knows the database's value types (asyncpg UUIDs)
+        document = pick(company, fieldset.fields)
 
-    users = await company_service.get_company_users(company_id)
+        if "users" in fieldset.include:
+            document["users"] = users
+            document["users_next_cursor"] = users_next_cursor
 
-    if not users:
-        raise HTTPException(status_code=404,
-                            detail="No users found for this company")
+        return TrustedJSONResponse(document)
 
-    return CompanyWithUsersResponse(
-        id=company.id,
-        name=company.name,
-        domain=company.domain,
-        users=[UserResponse.model_validate(user) for user in users]
-    )
+    return await response_cache.fetch(
+        company_users_key(company_id), render, field=fieldset.cache_field())
 
 
 @router.post("/companies", response_model=CompanyResponse, status_code=201)
@@ -70,6 +145,6 @@ async def create_company(
     try:
         company = await company_service.create_company(company_data.name, company_data.domain)
 
-        return company
+        return respond(build(CompanyResponse, company), status_code=201)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
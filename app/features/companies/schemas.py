@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 import uuid
 from pydantic import BaseModel
 
@@ -19,4 +19,7 @@ class CompanyResponse(CompanyBase):
 
 
 class CompanyWithUsersResponse(CompanyResponse):
+    # The first page of users, the next ones are at
+    # /users?company_id={id}&cursor=<users_next_cursor>
     users: List[UserResponse]
+    users_next_cursor: Optional[str] = None
@@ -1,12 +1,46 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Optional
+from sqlalchemy import any_, func, literal, or_, select, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased, load_only
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
+from app.core.batch import in_request_order
+from app.core.loader import entity_loader, uuid_array
+from app.core.pagination import DEFAULT_PAGE_SIZE, EMBED_LIMIT, apply_keyset, paginate, split_page
+from app.core.rendering import (
+    aggregate_page,
+    as_text,
+    fetch_json_with_page,
+    json_object,
+    page_lateral,
+    paginate_json
+)
+from app.core.metrics import instrument_service
+from app.core.search import (
+    MIN_FUZZY_LENGTH,
+    fuzzy_match,
+    pattern_order,
+    rank_matches,
+    starts_with,
+    word_similarity
+)
 from app.features.companies.models import Company
 from app.features.users.models import User
+from app.features.users.service import user_json_object
 
 
+async def load_companies(session: AsyncSession, company_ids: List[UUID]) -> Dict[UUID, Company]:
+    """Load companies by id with a single `= ANY()` query, keyed by id."""
+
+    result = await session.execute(
+        select(Company).where(Company.id == any_(uuid_array("company_ids", company_ids)))
+    )
+
+    return {company.id: company for company in result.scalars()}
+
+
+@instrument_service
 class CompanyService:
     def __init__(self, session: AsyncSession):
         """
@@ -17,18 +51,67 @@ class CompanyService:
         """
 
         self.session = session
+        self._companies = entity_loader(session, "companies", load_companies)
 
-    async def get_all_companies(self) -> List[Company]:
+    async def get_all_companies(
+            self,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None
+    ) -> Tuple[List[Company], Optional[str]]:
         """
-        Retrieve all companies in the database.
+        Retrieve a page of companies, ordered by name.
+
+        Args:
+            limit: The maximum number of companies to return
+            cursor: The cursor returned with the previous page, if any
 
         Returns:
-            A list of all companies
+            The companies of the page and the cursor of the next page,
+            or None if this is the last page
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+
+        return await paginate(
+            self.session,
+            select(Company),
+            (Company.name, Company.id),
+            limit,
+            cursor
+        )
+
+    async def get_all_companies_json(
+            self,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None
+    ) -> bytes:
         """
+        Same as get_all_companies, but with the page rendered to JSON by
+        Postgres.
 
-        result = await self.session.execute(select(Company))
+        Returns:
+            The page as JSON bytes, shaped like Page[CompanyResponse]
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
 
-        return list(result.scalars().all())
+        return await paginate_json(
+            self.session,
+            select(
+                as_text(json_object(
+                    name=Company.name,
+                    domain=Company.domain,
+                    id=Company.id
+                )),
+                Company.name,
+                Company.id
+            ),
+            (Company.name, Company.id),
+            limit,
+            cursor
+        )
 
     async def get_company_by_id(self, company_id: UUID) -> Optional[Company]:
         """
@@ -41,11 +124,8 @@ class CompanyService:
             The company if found, otherwise None
         """
 
-        result = await self.session.execute(
-            select(Company).where(Company.id == company_id)
-        )
-
-        return result.scalar_one_or_none()
+        # Batched with the other lookups made at the same time
+        return await self._companies.load(company_id)
 
     async def get_company_by_name(
             self, company_name: str
@@ -66,6 +146,70 @@ class CompanyService:
 
         return result.scalar_one_or_none()
 
+    async def search_companies(self, query: str, limit: int) -> List[Company]:
+        """
+        Search companies by name and domain, prefix matches first, then the
+        closest fuzzy matches.
+
+        Args:
+            query: What to look for, e.g. "acme"
+            limit: The maximum number of companies to return
+
+        Returns:
+            The companies found, best match first
+        """
+
+        score = func.greatest(
+            word_similarity(query, Company.name),
+            word_similarity(query, Company.domain)
+        ).label("score")
+
+        # One branch per prefix index, each stopping after limit rows
+        branches = [
+            select(Company.id, literal(1).label("prefix"), score)
+            .where(starts_with(column, query))
+            .order_by(pattern_order(column))
+            .limit(limit)
+            for column in (Company.name, Company.domain)
+        ]
+
+        if len(query) >= MIN_FUZZY_LENGTH:
+            branches.append(
+                select(Company.id, literal(0).label("prefix"), score)
+                .where(or_(fuzzy_match(query, Company.name), fuzzy_match(query, Company.domain)))
+                .order_by(score.desc())
+                .limit(limit)
+            )
+
+        ranked = rank_matches(*branches)
+        result = await self.session.execute(
+            select(Company)
+            .join(ranked, ranked.c.id == Company.id)
+            .order_by(ranked.c.prefix.desc(), ranked.c.score.desc(), Company.name, Company.id)
+            .limit(limit)
+        )
+
+        return list(result.scalars())
+
+    async def get_companies_by_ids(
+            self,
+            company_ids: List[UUID]
+    ) -> Tuple[List[Company], List[UUID]]:
+        """
+        Retrieve several companies by id with a single indexed query.
+
+        Args:
+            company_ids: The ids to look up, duplicates are ignored
+
+        Returns:
+            The companies found, in the order their ids were given, and the
+            ids that don't exist
+        """
+
+        found = await load_companies(self.session, list(dict.fromkeys(company_ids)))
+
+        return in_request_order(company_ids, found)
+
     async def get_company_by_domain(self, domain: str) -> Optional[Company]:
         """
         Find a company by its domain name.
@@ -83,22 +227,143 @@ class CompanyService:
 
         return result.scalar_one_or_none()
 
-    async def get_company_users(self, company_id: UUID) -> List[User]:
+    async def get_company_users(
+            self,
+            company_id: UUID,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None
+    ) -> Tuple[List[User], Optional[str]]:
         """
-        Get all users that belong to a specific company.
+        Get a page of the users that belong to a specific company.
 
         Args:
             company_id: The company to get users for
+            limit: The maximum number of users to return
+            cursor: The cursor returned with the previous page, if any
+
+        Returns:
+            The users of the page sorted by email and the cursor of the
+            next page, or None if this is the last page
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+
+        return await paginate(
+            self.session,
+            select(User).where(User.company_id == company_id),
+            (User.email, User.id),
+            limit,
+            cursor
+        )
+
+    async def get_company_with(
+            self,
+            company_id: UUID,
+            fields: List[str],
+            include: List[str]
+    ) -> Optional[Tuple[Company, List[User], Optional[str]]]:
+        """
+        Retrieve a company with only some of its columns, and the first page
+        of its users in the same query.
+
+        The users come from a LATERAL subquery capped at EMBED_LIMIT + 1
+        rows, so the company row is repeated once per user on the wire,
+        which costs less than a second round trip for a page this size.
+
+        Args:
+            company_id: The company to retrieve
+            fields: The company columns to load
+            include: The related data to load, "users"
 
         Returns:
-            A list of all users in the specified company
+            The company, its users sorted by email and the cursor of their
+            next page (no users when they aren't included), or None if the
+            company doesn't exist
         """
 
+        query = (
+            select(Company)
+            .options(load_only(*(getattr(Company, name) for name in fields)))
+            .where(Company.id == company_id)
+        )
+
+        if "users" not in include:
+            company = (await self.session.execute(query)).scalar_one_or_none()
+
+            return (company, [], None) if company else None
+
+        page = apply_keyset(
+            select(User).where(User.company_id == Company.id),
+            (User.email, User.id),
+            EMBED_LIMIT
+        ).lateral("company_users")
+        company_user = aliased(User, page)
+
         result = await self.session.execute(
-            select(User).where(User.company_id == company_id)
+            query.add_columns(company_user)
+            .select_from(Company)
+            .outerjoin(page, true())
+            .order_by(company_user.email, company_user.id)
+        )
+        rows = result.all()
+
+        if not rows:
+            return None
+
+        users, next_cursor = split_page(
+            [user for _, user in rows if user is not None], (User.email, User.id), EMBED_LIMIT)
+
+        return rows[0][0], users, next_cursor
+
+    async def get_company_users_json(
+            self, company_id: UUID
+    ) -> Optional[Tuple[bytes, bool]]:
+        """
+        Render a company and the first page of its users to JSON, in a
+        single statement: the users are aggregated from a LATERAL subquery
+        capped at EMBED_LIMIT + 1 rows.
+
+        Args:
+            company_id: The company to get users for
+
+        Returns:
+            The document, shaped like CompanyWithUsersResponse, and whether
+            the company has any users; None if the company doesn't exist
+        """
+
+        page = page_lateral(
+            select(user_json_object().label("document"), User.email, User.id)
+            .where(User.company_id == Company.id),
+            (User.email, User.id),
+            EMBED_LIMIT,
+            "company_users"
+        )
+
+        rendered = await fetch_json_with_page(
+            self.session,
+            select(as_text(json_object(
+                name=Company.name,
+                domain=Company.domain,
+                id=Company.id,
+                users=aggregate_page(page, EMBED_LIMIT)
+            )))
+            .select_from(Company)
+            .outerjoin(page, true())
+            .where(Company.id == company_id)
+            .group_by(Company.id),
+            "users",
+            page,
+            (User.email, User.id),
+            EMBED_LIMIT
         )
 
-        return list(result.scalars().all())
+        if rendered is None:
+            return None
+
+        document, users = rendered
+
+        return document, users > 0
 
     async def create_company(self, name: str, domain: str) -> Company:
         """
@@ -115,16 +380,20 @@ class CompanyService:
             ValueError: If a company with this domain already exists
         """
 
-        existing = await self.get_company_by_domain(domain)
-
-        if existing:
-            raise ValueError(f"Company with domain {domain} already exists")
+        # The unique constraint on domain decides, so two concurrent creates
+        # can't both pass a check made before the insert
+        result = await self.session.execute(
+            pg_insert(Company)
+            .values(name=name, domain=domain)
+            .on_conflict_do_nothing(index_elements=["domain"])
+            .returning(Company)
+        )
 
-        company = Company(name=name, domain=domain)
+        company = result.scalar_one_or_none()
 
-        self.session.add(company)
+        if company is None:
+            raise ValueError(f"Company with domain {domain} already exists")
 
         await self.session.commit()
-        await self.session.refresh(company)
 
         return company
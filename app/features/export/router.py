@@ -0,0 +1,41 @@
+from typing import AsyncIterator
+
+import orjson
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+
+from app.core.database import read_session_maker
+from app.core.serialization import dumps
+from app.features.export.service import ExportService
+
+router = APIRouter()
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def _ndjson(stream_name: str) -> AsyncIterator[bytes]:
+    # The response outlives the request's dependencies, so the stream owns
+    # its session instead of borrowing the one from get_read_session
+    async with read_session_maker()() as session:
+        stream = getattr(ExportService(session), stream_name)
+
+        async for batch in stream():
+            yield b"".join(
+                dumps(dict(row), option=orjson.OPT_APPEND_NEWLINE)
+                for row in batch
+            )
+
+
+@router.get("/export/companies")
+async def export_companies():
+    return StreamingResponse(_ndjson("stream_companies"), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/export/users")
+async def export_users():
+    return StreamingResponse(_ndjson("stream_users"), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/export/memberships")
+async def export_memberships():
+    return StreamingResponse(_ndjson("stream_memberships"), media_type=NDJSON_MEDIA_TYPE)
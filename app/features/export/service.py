@@ -0,0 +1,92 @@
+from typing import AsyncIterator, List
+
+from sqlalchemy import RowMapping, Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import instrument_service
+from app.features.companies.models import Company
+from app.features.projects.models import ProjectMembership
+from app.features.users.models import User
+
+EXPORT_BATCH_SIZE = 1000
+
+
+@instrument_service
+class ExportService:
+    def __init__(self, session: AsyncSession):
+        """
+        Initialize the export service with a database session.
+
+        Args:
+            session: The async database session to use for all operations
+        """
+
+        self.session = session
+
+    async def stream_companies(self) -> AsyncIterator[List[RowMapping]]:
+        """
+        Stream every company, ordered by id.
+
+        Yields:
+            Batches of company rows
+        """
+
+        async for batch in self._stream(
+            select(Company.id, Company.name, Company.domain, Company.created_at)
+            .order_by(Company.id)
+        ):
+            yield batch
+
+    async def stream_users(self) -> AsyncIterator[List[RowMapping]]:
+        """
+        Stream every user, ordered by id.
+
+        Yields:
+            Batches of user rows
+        """
+
+        async for batch in self._stream(
+            select(User.id, User.email, User.company_id, User.created_at)
+            .order_by(User.id)
+        ):
+            yield batch
+
+    async def stream_memberships(self) -> AsyncIterator[List[RowMapping]]:
+        """
+        Stream every project membership, ordered by id.
+
+        Yields:
+            Batches of membership rows
+        """
+
+        async for batch in self._stream(
+            select(
+                ProjectMembership.id,
+                ProjectMembership.project_id,
+                ProjectMembership.user_id,
+                ProjectMembership.company_id,
+                ProjectMembership.created_at
+            ).order_by(ProjectMembership.id)
+        ):
+            yield batch
+
+    async def _stream(self, query: Select) -> AsyncIterator[List[RowMapping]]:
+        """
+        Run a query on a server-side cursor and yield its rows in batches.
+
+        Only plain columns are selected so rows never enter the identity
+        map, which keeps memory flat regardless of the table size.
+
+        Args:
+            query: The query to stream
+
+        Yields:
+            Batches of at most EXPORT_BATCH_SIZE rows
+        """
+
+        result = await self.session.stream(
+            query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+
+        async for partition in result.mappings().partitions():
+            yield partition
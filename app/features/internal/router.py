@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+
+from app.core.database import engine, replica_engines
+
+router = APIRouter()
+
+
+@router.get("/pool")
+async def get_pool_stats():
+    """
+    Live statistics of this process's connection pools: configured size,
+    connections checked out and in overflow, checkouts that timed out and a
+    histogram of how long checkouts waited, in seconds.
+    """
+    return {
+        "primary": engine.pool.stats(),
+        "replicas": [replica.pool.stats() for replica in replica_engines],
+    }
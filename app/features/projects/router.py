@@ -1,15 +1,26 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException
 
-from app.core.dependencies import get_company_service, get_project_service
+from app.core.batch import Batch, get_batch_ids
+from app.core.cache import project_key, project_members_key, response_cache
+from app.core.coalescing import coalesce
+from app.core.dependencies import get_company_service, get_project_read_service, get_project_service
+from app.core.fieldsets import Fieldset, fieldset_params, pick
+from app.core.pagination import Page, PageParams, get_page_params
+from app.core.rendering import RawJSONResponse, renders_in_db
+from app.core.serialization import TrustedJSONResponse, build, build_batch, build_page, respond
+from app.features.companies.schemas import CompanyResponse
 from app.features.companies.service import CompanyService
-from app.features.projects.schemas import ProjectCreate, ProjectMembershipCreate, ProjectMembershipResponse, ProjectResponse, ProjectWithMembersResponse, ProjectWithMembersResponse
+from app.features.projects.schemas import ProjectCreate, ProjectMembershipBatch, ProjectMembershipBatchResponse, ProjectMembershipCreate, ProjectMembershipResponse, ProjectResponse, ProjectWithMembersResponse
 from app.features.projects.service import ProjectService
 from app.features.users.schemas import UserResponse
 
 router = APIRouter()
 
+project_fieldset = fieldset_params(
+    ProjectWithMembersResponse, includes=["members", "company"], default_include=["members"])
+
 
 @router.post("/projects", response_model=ProjectResponse, status_code=201)
 async def create_project(
@@ -25,49 +36,84 @@ async def create_project(
     try:
         project = await project_service.create_project(project_data.name, project_data.company_id)
 
-        return ProjectResponse.model_validate(project, from_attributes=True)
+        return respond(build(ProjectResponse, project), status_code=201)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/projects", response_model=List[ProjectResponse])
+@router.get("/projects",
+            response_model=Union[Batch[ProjectResponse], Page[ProjectResponse]])
 async def list_projects(
     company_id: Optional[UUID] = None,
-    project_service: ProjectService = Depends(get_project_service),
+    ids: Optional[List[UUID]] = Depends(get_batch_ids),
+    page: PageParams = Depends(get_page_params),
+    project_service: ProjectService = Depends(get_project_read_service),
 ):
-    projects = await project_service.get_all_projects(company_id)
+    # A multi-get ignores the listing parameters
+    if ids is not None:
+        projects, missing = await project_service.get_projects_by_ids(ids)
+
+        return respond(build_batch(ProjectResponse, projects, missing))
+
+    try:
+        if renders_in_db("projects.list"):
+            return RawJSONResponse(await project_service.get_all_projects_json(
+                company_id, page.limit, page.cursor))
 
-    return [
-        ProjectResponse.model_validate(
-            project,
-            from_attributes=True
-        ) for project in projects
-    ]
+        projects, next_cursor = await project_service.get_all_projects(
+            company_id, page.limit, page.cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return respond(build_page(ProjectResponse, projects, next_cursor))
 
 
 @router.get("/projects/{project_id}",
             response_model=ProjectWithMembersResponse)
+@coalesce("project_id", "fieldset")
 async def get_project_details(
     project_id: UUID,
-    project_service: ProjectService = Depends(get_project_service),
+    fieldset: Fieldset = Depends(project_fieldset),
+    project_service: ProjectService = Depends(get_project_read_service),
 ):
-    project = await project_service.get_project_by_id(project_id)
+    async def render():
+        if renders_in_db("projects.detail") and not fieldset.sparse:
+            document = await project_service.get_project_details_json(project_id)
 
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+            if not document:
+                raise HTTPException(status_code=404, detail="Project not found")
+
+            return RawJSONResponse(document)
 
-    members = await project_service.get_project_members(project_id)
+        found = await project_service.get_project_with(
+            project_id, fieldset.fields, fieldset.include)
 
-    return ProjectWithMembersResponse(
-        id=project.id,
-        name=project.name,
-        company_id=project.company_id,
-        members=[
-            UserResponse.model_validate(
-                user,
-                from_attributes=True
-            ) for user in members
-        ])
+        if not found:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        project, users, members_next_cursor = found
+        members = [build(UserResponse, user) for user in users]
+
+        if not fieldset.sparse:
+            return respond(build(
+                ProjectWithMembersResponse, project,
+                members=members, members_next_cursor=members_next_cursor))
+
+        # Sparse documents don't match the response model, they are
+        # encoded as they are, in either serialization mode, with the
+        # encoder that knows the database's value types (asyncpg UUIDs)
+        document = pick(project, fieldset.fields)
+
+        if "members" in fieldset.include:
+            document["members"] = members
+            document["members_next_cursor"] = members_next_cursor
+
+        if "company" in fieldset.include:
+            document["company"] = build(CompanyResponse, project.company)
+
+        return TrustedJSONResponse(document)
+
+    return await response_cache.fetch(project_key(project_id), render, field=fieldset.cache_field())
 
 
 @router.post("/projects/{project_id}/members",
@@ -86,11 +132,42 @@ async def add_user_to_project(
             detail="Could not add user to project. User may already be a member, or user/project doesn't exist."
         )
 
-    return ProjectMembershipResponse.model_validate(
-        membership, from_attributes=True
+    return respond(
+        build(ProjectMembershipResponse, membership),
+        status_code=201
     )
 
 
+@router.post("/projects/{project_id}/members:batch",
+             response_model=ProjectMembershipBatchResponse)
+async def add_users_to_project(
+    project_id: UUID,
+    batch: ProjectMembershipBatch,
+    project_service: ProjectService = Depends(get_project_service),
+):
+    results = await project_service.add_users_to_project(project_id, batch.user_ids)
+
+    if results is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    return respond(build(ProjectMembershipBatchResponse, project_id=project_id, results=results))
+
+
+@router.post("/projects/{project_id}/members:batchDelete",
+             response_model=ProjectMembershipBatchResponse)
+async def remove_users_from_project(
+    project_id: UUID,
+    batch: ProjectMembershipBatch,
+    project_service: ProjectService = Depends(get_project_service),
+):
+    results = await project_service.remove_users_from_project(project_id, batch.user_ids)
+
+    if results is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    return respond(build(ProjectMembershipBatchResponse, project_id=project_id, results=results))
+
+
 @router.delete("/projects/{project_id}/members/{user_id}", status_code=204)
 async def remove_user_from_project(
     project_id: UUID,
@@ -106,21 +183,33 @@ async def remove_user_from_project(
 
 
 @router.get("/projects/{project_id}/members",
-            response_model=List[UserResponse])
+            response_model=Page[UserResponse])
+@coalesce("project_id", "page")
 async def get_project_members(
     project_id: UUID,
-    project_service: ProjectService = Depends(get_project_service)
+    page: PageParams = Depends(get_page_params),
+    project_service: ProjectService = Depends(get_project_read_service)
 ):
-    project = await project_service.get_project_by_id(project_id)
+    async def render():
+        project = await project_service.get_project_by_id(project_id)
 
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        try:
+            if renders_in_db("projects.members"):
+                return RawJSONResponse(await project_service.get_project_members_page_json(
+                    project_id, page.limit, page.cursor))
 
-    members = await project_service.get_project_members(project_id)
+            members, next_cursor = await project_service.get_project_members_page(
+                project_id, page.limit, page.cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-    return [
-        UserResponse.model_validate(
-            user,
-            from_attributes=True
-        ) for user in members
-    ]
+        return respond(build_page(UserResponse, members, next_cursor))
+
+    return await response_cache.fetch(
+        project_members_key(project_id),
+        render,
+        field=f"{page.limit}:{page.cursor or ''}"
+    )
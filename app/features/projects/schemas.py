@@ -1,9 +1,12 @@
-from typing import List
+from enum import Enum
+from typing import List, Optional
 from uuid import UUID
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 from app.features.users.schemas import UserResponse
 
+MAX_MEMBERSHIP_BATCH = 1000
+
 
 class ProjectBase(BaseModel):
     name: str
@@ -19,7 +22,10 @@ class ProjectResponse(ProjectBase):
 
 
 class ProjectWithMembersResponse(ProjectResponse):
+    # The first page of members, the next ones are at
+    # /projects/{id}/members?cursor=<members_next_cursor>
     members: List[UserResponse]
+    members_next_cursor: Optional[str] = None
 
 
 class ProjectMembershipBase(BaseModel):
@@ -36,3 +42,27 @@ class ProjectMembershipResponse(ProjectMembershipBase):
     id: UUID
     project_id: UUID
     company_id: UUID
+
+
+class ProjectMembershipBatch(BaseModel):
+    user_ids: List[UUID] = Field(min_length=1, max_length=MAX_MEMBERSHIP_BATCH)
+
+
+class MembershipOutcome(str, Enum):
+    ADDED = "added"
+    ALREADY_MEMBER = "already_member"
+    USER_NOT_FOUND = "user_not_found"
+    COMPANY_MISMATCH = "company_mismatch"
+    REMOVED = "removed"
+    NOT_MEMBER = "not_member"
+
+
+class ProjectMembershipOutcome(BaseModel):
+    user_id: UUID
+    outcome: MembershipOutcome
+    membership_id: Optional[UUID] = None
+
+
+class ProjectMembershipBatchResponse(BaseModel):
+    project_id: UUID
+    results: List[ProjectMembershipOutcome]
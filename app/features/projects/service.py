@@ -1,12 +1,52 @@
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import delete, select, and_
-from typing import List, Optional
-
+from sqlalchemy import any_, delete, func, select, and_, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased, joinedload, load_only
+from typing import Dict, List, Optional, Tuple
+
+from app.core.cache import project_key, project_members_key, response_cache
+from app.core.batch import in_request_order
+from app.core.loader import entity_loader, uuid_array
+from app.core.pagination import DEFAULT_PAGE_SIZE, EMBED_LIMIT, apply_keyset, paginate, split_page
+from app.core.rendering import (
+    aggregate_page,
+    as_text,
+    fetch_json_with_page,
+    json_object,
+    page_lateral,
+    paginate_json
+)
+from app.core.metrics import instrument_service
+from app.features.companies.models import Company
 from app.features.projects.models import Project, ProjectMembership
+from app.features.projects.schemas import MembershipOutcome, ProjectMembershipOutcome
 from app.features.users.models import User
+from app.features.users.service import user_json_object
+
+
+def project_json_object(**extra):
+    """JSON object matching ProjectResponse, for documents rendered by Postgres."""
+
+    return json_object(
+        name=Project.name,
+        company_id=Project.company_id,
+        id=Project.id,
+        **extra
+    )
+
 
+async def load_projects(session: AsyncSession, project_ids: List[UUID]) -> Dict[UUID, Project]:
+    """Load projects by id with a single `= ANY()` query, keyed by id."""
 
+    result = await session.execute(
+        select(Project).where(Project.id == any_(uuid_array("project_ids", project_ids)))
+    )
+
+    return {project.id: project for project in result.scalars()}
+
+
+@instrument_service
 class ProjectService:
     def __init__(self, session: AsyncSession):
         """
@@ -17,6 +57,7 @@ class ProjectService:
         """
 
         self.session = session
+        self._projects = entity_loader(session, "projects", load_projects)
 
     async def create_project(self, name: str, company_id: UUID) -> Project:
         """
@@ -56,60 +97,257 @@ class ProjectService:
             The project if found, otherwise None
         """
 
+        # Batched with the other lookups made at the same time
+        return await self._projects.load(project_id)
+
+    async def get_project_with(
+            self,
+            project_id: UUID,
+            fields: List[str],
+            include: List[str]
+    ) -> Optional[Tuple[Project, List[User], Optional[str]]]:
+        """
+        Retrieve a project with only some of its columns, and its company
+        and the first page of its members in the same query.
+
+        The members come from a LATERAL subquery capped at EMBED_LIMIT + 1
+        rows, so the project row is repeated once per member on the wire,
+        which costs less than a second round trip for a page this size.
+
+        Args:
+            project_id: The project to retrieve
+            fields: The project columns to load
+            include: The related data to load, "members" and/or "company"
+
+        Returns:
+            The project, its members sorted by email and the cursor of
+            their next page (no members when they aren't included), or
+            None if the project doesn't exist
+        """
+
+        options = [load_only(*(getattr(Project, name) for name in fields))]
+
+        if "company" in include:
+            options.append(
+                joinedload(Project.company).load_only(Company.id, Company.name, Company.domain))
+
+        query = select(Project).options(*options).where(Project.id == project_id)
+
+        if "members" not in include:
+            project = (await self.session.execute(query)).scalar_one_or_none()
+
+            return (project, [], None) if project else None
+
+        page = apply_keyset(
+            select(User)
+            .join(ProjectMembership)
+            .where(ProjectMembership.project_id == Project.id),
+            (User.email, User.id),
+            EMBED_LIMIT
+        ).lateral("members")
+        member = aliased(User, page)
+
         result = await self.session.execute(
-            select(Project).where(Project.id == project_id)
+            query.add_columns(member)
+            .select_from(Project)
+            .outerjoin(page, true())
+            .order_by(member.email, member.id)
         )
+        rows = result.all()
 
-        return result.scalar_one_or_none()
+        if not rows:
+            return None
+
+        members, next_cursor = split_page(
+            [user for _, user in rows if user is not None], (User.email, User.id), EMBED_LIMIT)
+
+        return rows[0][0], members, next_cursor
+
+    async def get_project_details_json(self, project_id: UUID) -> Optional[bytes]:
+        """
+        Render a project and the first page of its members to JSON, in a
+        single statement: the members are aggregated from a LATERAL
+        subquery capped at EMBED_LIMIT + 1 rows.
+
+        Args:
+            project_id: The unique identifier for the project
+
+        Returns:
+            The document, shaped like ProjectWithMembersResponse, or None
+            if the project doesn't exist
+        """
+
+        page = page_lateral(
+            select(user_json_object().label("document"), User.email, User.id)
+            .join(ProjectMembership)
+            .where(ProjectMembership.project_id == Project.id),
+            (User.email, User.id),
+            EMBED_LIMIT,
+            "members"
+        )
+
+        rendered = await fetch_json_with_page(
+            self.session,
+            select(as_text(project_json_object(members=aggregate_page(page, EMBED_LIMIT))))
+            .select_from(Project)
+            .outerjoin(page, true())
+            .where(Project.id == project_id)
+            .group_by(Project.id),
+            "members",
+            page,
+            (User.email, User.id),
+            EMBED_LIMIT
+        )
+
+        return rendered[0] if rendered else None
+
+    async def get_projects_by_ids(
+            self,
+            project_ids: List[UUID]
+    ) -> Tuple[List[Project], List[UUID]]:
+        """
+        Retrieve several projects by id with a single indexed query.
+
+        Args:
+            project_ids: The ids to look up, duplicates are ignored
+
+        Returns:
+            The projects found, in the order their ids were given, and the
+            ids that don't exist
+        """
+
+        found = await load_projects(self.session, list(dict.fromkeys(project_ids)))
+
+        return in_request_order(project_ids, found)
 
     async def get_all_projects(
             self,
-            company_id: Optional[UUID] = None
-    ) -> List[Project]:
+            company_id: Optional[UUID] = None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None
+    ) -> Tuple[List[Project], Optional[str]]:
         """
-        Get projects, optionally filtered by company.
+        Get a page of projects, optionally filtered by company.
 
         When company_id is provided, it returns only projects belonging to that company.
-        When company_id is None, it returns all projects across all companies.
+        When company_id is None, it returns projects across all companies.
 
         Results are ordered alphabetically by project name.
 
         Args:
             company_id: Optional company ID to filter projects by
+            limit: The maximum number of projects to return
+            cursor: The cursor returned with the previous page, if any
 
         Returns:
-            A list of projects sorted by name
+            The projects of the page sorted by name and the cursor of the
+            next page, or None if this is the last page
+
+        Raises:
+            ValueError: If the cursor is invalid
         """
 
         query = select(Project)
 
         if company_id:
             query = query.where(Project.company_id == company_id)
-        query = query.order_by(Project.name)
 
-        result = await self.session.execute(query)
+        return await paginate(
+            self.session,
+            query,
+            (Project.name, Project.id),
+            limit,
+            cursor
+        )
 
-        return list(result.scalars().all())
+    async def get_all_projects_json(
+            self,
+            company_id: Optional[UUID] = None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None
+    ) -> bytes:
+        """
+        Same as get_all_projects, but with the page rendered to JSON by
+        Postgres.
 
-    async def get_project_members(self, project_id: UUID) -> List[User]:
+        Returns:
+            The page as JSON bytes, shaped like Page[ProjectResponse]
+
+        Raises:
+            ValueError: If the cursor is invalid
         """
-        Get all users who are members of a specific project.
+
+        query = select(as_text(project_json_object()), Project.name, Project.id)
+
+        if company_id:
+            query = query.where(Project.company_id == company_id)
+
+        return await paginate_json(
+            self.session,
+            query,
+            (Project.name, Project.id),
+            limit,
+            cursor
+        )
+
+    async def get_project_members_page(
+            self,
+            project_id: UUID,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None
+    ) -> Tuple[List[User], Optional[str]]:
+        """
+        Get a page of the users who are members of a specific project.
 
         Args:
             project_id: The project to get members for
+            limit: The maximum number of members to return
+            cursor: The cursor returned with the previous page, if any
 
         Returns:
-            A list of users who are members of this project, sorted by email
+            The members of the page sorted by email and the cursor of the
+            next page, or None if this is the last page
+
+        Raises:
+            ValueError: If the cursor is invalid
         """
 
-        result = await self.session.execute(
+        return await paginate(
+            self.session,
             select(User)
             .join(ProjectMembership)
-            .where(ProjectMembership.project_id == project_id)
-            .order_by(User.email)
+            .where(ProjectMembership.project_id == project_id),
+            (User.email, User.id),
+            limit,
+            cursor
         )
 
-        return list(result.scalars().all())
+    async def get_project_members_page_json(
+            self,
+            project_id: UUID,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None
+    ) -> bytes:
+        """
+        Same as get_project_members_page, but with the page rendered to
+        JSON by Postgres.
+
+        Returns:
+            The page as JSON bytes, shaped like Page[UserResponse]
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+
+        return await paginate_json(
+            self.session,
+            select(as_text(user_json_object()), User.email, User.id)
+            .join(ProjectMembership)
+            .where(ProjectMembership.project_id == project_id),
+            (User.email, User.id),
+            limit,
+            cursor
+        )
 
     async def add_user_to_project(
             self,
@@ -133,46 +371,28 @@ class ProjectService:
             failed due to validation issues or if membership already exists
         """
 
-        existing = await self.session.execute(
-            select(ProjectMembership).where(
-                and_(
-                    ProjectMembership.project_id == project_id,
-                    ProjectMembership.user_id == user_id
-                )
+        # One INSERT ... SELECT: the join only yields a row when the project
+        # and the user exist and share a company, and the unique constraint
+        # turns an existing membership into a no-op
+        result = await self.session.execute(
+            pg_insert(ProjectMembership)
+            .from_select(
+                ["id", "project_id", "user_id", "company_id"],
+                select(func.gen_random_uuid(), Project.id, User.id, Project.company_id)
+                .join(User, and_(User.id == user_id, User.company_id == Project.company_id))
+                .where(Project.id == project_id)
             )
+            .on_conflict_do_nothing(index_elements=["project_id", "user_id"])
+            .returning(ProjectMembership)
         )
 
-        if existing.scalar_one_or_none():
-            return None
-
-        project_result = await self.session.execute(
-            select(Project).where(Project.id == project_id)
-        )
-
-        project = project_result.scalar_one_or_none()
-
-        if not project:
-            return None
-
-        user_result = await self.session.execute(
-            select(User).where(User.id == user_id)
-        )
+        membership = result.scalar_one_or_none()
 
-        user = user_result.scalar_one_or_none()
-
-        if user is None or user.company_id != project.company_id:
+        if membership is None:
             return None
 
-        membership = ProjectMembership(
-            project_id=project_id,
-            user_id=user_id,
-            company_id=project.company_id
-        )
-
-        self.session.add(membership)
-
         await self.session.commit()
-        await self.session.refresh(membership)
+        await self._invalidate_members(project_id)
 
         return membership
 
@@ -201,8 +421,160 @@ class ProjectService:
 
         await self.session.commit()
 
+        if result.rowcount > 0:
+            await self._invalidate_members(project_id)
+
         return result.rowcount > 0
 
+    async def add_users_to_project(
+            self,
+            project_id: UUID,
+            user_ids: List[UUID]
+    ) -> Optional[List[ProjectMembershipOutcome]]:
+        """
+        Add several users to a project in one statement and one transaction.
+
+        The same checks as add_user_to_project are applied to the whole set
+        at once: users must exist and belong to the project's company, and
+        existing memberships are left untouched (ON CONFLICT DO NOTHING).
+
+        Args:
+            project_id: The project to add the users to
+            user_ids: The users to add, duplicates are ignored
+
+        Returns:
+            The outcome for each distinct user, in request order, or None if
+            the project doesn't exist
+        """
+
+        user_ids = list(dict.fromkeys(user_ids))
+
+        requested = select(
+            func.unnest(uuid_array("user_ids", user_ids)).label("user_id")
+        ).cte("requested")
+
+        candidates = (
+            select(
+                requested.c.user_id,
+                Project.id.label("project_id"),
+                Project.company_id,
+                User.id.is_not(None).label("user_exists"),
+                (User.company_id == Project.company_id).label("same_company")
+            )
+            .select_from(requested)
+            .join(Project, Project.id == project_id)
+            .outerjoin(User, User.id == requested.c.user_id)
+            .cte("candidates")
+        )
+
+        inserted = (
+            pg_insert(ProjectMembership)
+            .from_select(
+                ["id", "project_id", "user_id", "company_id"],
+                select(
+                    func.gen_random_uuid(),
+                    candidates.c.project_id,
+                    candidates.c.user_id,
+                    candidates.c.company_id
+                ).where(candidates.c.same_company)
+            )
+            .on_conflict_do_nothing(index_elements=["project_id", "user_id"])
+            .returning(ProjectMembership.id, ProjectMembership.user_id)
+            .cte("inserted")
+        )
+
+        result = await self.session.execute(
+            select(
+                candidates.c.user_id,
+                candidates.c.user_exists,
+                candidates.c.same_company,
+                inserted.c.id.label("membership_id")
+            ).select_from(
+                candidates.outerjoin(inserted, inserted.c.user_id == candidates.c.user_id)
+            )
+        )
+        rows = {row.user_id: row for row in result}
+
+        await self.session.commit()
+
+        if any(row.membership_id is not None for row in rows.values()):
+            await self._invalidate_members(project_id)
+
+        # Every requested user has a candidate row once the project exists
+        if not rows:
+            return None
+
+        outcomes = []
+
+        for user_id in user_ids:
+            row = rows[user_id]
+
+            if row.membership_id is not None:
+                outcome = MembershipOutcome.ADDED
+            elif not row.user_exists:
+                outcome = MembershipOutcome.USER_NOT_FOUND
+            elif not row.same_company:
+                outcome = MembershipOutcome.COMPANY_MISMATCH
+            else:
+                outcome = MembershipOutcome.ALREADY_MEMBER
+
+            outcomes.append(ProjectMembershipOutcome(
+                user_id=user_id, outcome=outcome, membership_id=row.membership_id))
+
+        return outcomes
+
+    async def remove_users_from_project(
+            self,
+            project_id: UUID,
+            user_ids: List[UUID]
+    ) -> Optional[List[ProjectMembershipOutcome]]:
+        """
+        Remove several users from a project in one statement and one
+        transaction.
+
+        Args:
+            project_id: The project to remove the users from
+            user_ids: The users to remove, duplicates are ignored
+
+        Returns:
+            The outcome for each distinct user, in request order, or None if
+            the project doesn't exist
+        """
+
+        user_ids = list(dict.fromkeys(user_ids))
+
+        result = await self.session.execute(
+            delete(ProjectMembership)
+            .where(
+                ProjectMembership.project_id == project_id,
+                ProjectMembership.user_id == any_(uuid_array("user_ids", user_ids))
+            )
+            .returning(ProjectMembership.user_id)
+            .execution_options(synchronize_session=False)
+        )
+        removed = set(result.scalars().all())
+
+        await self.session.commit()
+
+        if removed:
+            await self._invalidate_members(project_id)
+
+        # Only a batch that removed nothing can be for a missing project
+        if not removed and not await self.get_project_by_id(project_id):
+            return None
+
+        return [
+            ProjectMembershipOutcome(
+                user_id=user_id,
+                outcome=MembershipOutcome.REMOVED if user_id in removed else MembershipOutcome.NOT_MEMBER
+            )
+            for user_id in user_ids
+        ]
+
+    async def _invalidate_members(self, project_id: UUID):
+        # The project details embed the members, so both go
+        await response_cache.invalidate(project_key(project_id), project_members_key(project_id))
+
     async def get_project_by_name_and_company(
             self, name: str, company_id: UUID
     ) -> Optional[Project]:
@@ -0,0 +1,88 @@
+from typing import List, Optional, Union
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.core.batch import Batch, BatchGet, get_batch_ids
+from app.core.coalescing import coalesce
+from app.core.dependencies import get_user_read_service
+from app.core.pagination import Page, PageParams, get_page_params
+from app.core.search import SearchParams, SearchResults, get_search_params
+from app.core.serialization import build, build_batch, build_page, build_results, respond
+from app.features.users.schemas import UserResponse
+from app.features.users.service import UserService
+
+router = APIRouter()
+
+
+@router.post("/users:batchGet", response_model=Batch[UserResponse])
+async def batch_get_users(
+    batch: BatchGet,
+    user_service: UserService = Depends(get_user_read_service),
+):
+    users, missing = await user_service.get_users_by_ids(batch.ids)
+
+    return respond(build_batch(UserResponse, users, missing))
+
+
+@router.get("/users",
+            response_model=Union[Batch[UserResponse], Page[UserResponse]])
+async def list_users(
+    company_id: Optional[UUID] = None,
+    project_id: Optional[UUID] = None,
+    ids: Optional[List[UUID]] = Depends(get_batch_ids),
+    page: PageParams = Depends(get_page_params),
+    user_service: UserService = Depends(get_user_read_service),
+):
+    # A multi-get ignores the listing parameters
+    if ids is not None:
+        users, missing = await user_service.get_users_by_ids(ids)
+
+        return respond(build_batch(UserResponse, users, missing))
+
+    try:
+        users, next_cursor = await user_service.get_all_users(
+            company_id, project_id, page.limit, page.cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return respond(build_page(UserResponse, users, next_cursor))
+
+
+# Declared before /users/{user_id}, which would take "search" for an id
+@router.get("/users/search", response_model=SearchResults[UserResponse])
+async def search_users(
+    search: SearchParams = Depends(get_search_params),
+    user_service: UserService = Depends(get_user_read_service),
+):
+    users = await user_service.search_users(search.q, search.limit)
+
+    return respond(build_results(UserResponse, users))
+
+
+@router.get("/users/by-email/{email}", response_model=UserResponse)
+@coalesce("email")
+async def get_user_by_email(
+    email: str,
+    user_service: UserService = Depends(get_user_read_service),
+):
+    user = await user_service.get_user_by_email(email)
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return respond(build(UserResponse, user))
+
+
+@router.get("/users/{user_id}", response_model=UserResponse)
+@coalesce("user_id")
+async def get_user(
+    user_id: UUID,
+    user_service: UserService = Depends(get_user_read_service),
+):
+    user = await user_service.get_user_by_id(user_id)
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return respond(build(UserResponse, user))
@@ -1,12 +1,46 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import any_, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import company_users_key, response_cache
+from app.core.batch import in_request_order
+from app.core.loader import entity_loader, uuid_array
+from app.core.pagination import DEFAULT_PAGE_SIZE, paginate
+from app.core.rendering import json_object
+from app.core.metrics import instrument_service
+from app.core.search import (
+    MIN_FUZZY_LENGTH,
+    fuzzy_match,
+    pattern_order,
+    rank_matches,
+    starts_with,
+    word_distance,
+    word_similarity
+)
+from app.features.projects.models import ProjectMembership
 from app.features.users.models import User
 
 
+def user_json_object():
+    """JSON object matching UserResponse, for documents rendered by Postgres."""
+
+    return json_object(email=User.email, id=User.id, company_id=User.company_id)
+
+
+async def load_users(session: AsyncSession, user_ids: List[UUID]) -> Dict[UUID, User]:
+    """Load users by id with a single `= ANY()` query, keyed by id."""
+
+    result = await session.execute(
+        select(User).where(User.id == any_(uuid_array("user_ids", user_ids)))
+    )
+
+    return {user.id: user for user in result.scalars()}
+
+
+@instrument_service
 class UserService:
     def __init__(self, session: AsyncSession):
         """
@@ -17,6 +51,7 @@ class UserService:
         """
 
         self.session = session
+        self._users = entity_loader(session, "users", load_users)
 
     async def get_user_by_email(self, email: str) -> Optional[User]:
         """
@@ -46,23 +81,116 @@ class UserService:
             The user if found, otherwise None
         """
 
+        # Batched with the other lookups made at the same time
+        return await self._users.load(user_id)
+
+    async def get_users_by_ids(
+            self,
+            user_ids: List[UUID]
+    ) -> Tuple[List[User], List[UUID]]:
+        """
+        Retrieve several users by id with a single indexed query.
+
+        Args:
+            user_ids: The ids to look up, duplicates are ignored
+
+        Returns:
+            The users found, in the order their ids were given, and the
+            ids that don't exist
+        """
+
+        found = await load_users(self.session, list(dict.fromkeys(user_ids)))
+
+        return in_request_order(user_ids, found)
+
+    async def search_users(self, query: str, limit: int) -> List[User]:
+        """
+        Search users by email, prefix matches first, then the closest
+        fuzzy matches.
+
+        Each kind of match is an index scan that stops after limit rows:
+        the prefix on the lower(email) pattern index and the fuzzy matches
+        on the trigram index, nearest first, so the cost doesn't grow with
+        the number of users.
+
+        Args:
+            query: What to look for, e.g. "jane" or "acme.com"
+            limit: The maximum number of users to return
+
+        Returns:
+            The users found, best match first
+        """
+
+        branches = [
+            select(User.id, literal(1).label("prefix"), word_similarity(query, User.email).label("score"))
+            .where(starts_with(User.email, query))
+            .order_by(pattern_order(User.email))
+            .limit(limit)
+        ]
+
+        if len(query) >= MIN_FUZZY_LENGTH:
+            distance = word_distance(query, User.email)
+
+            branches.append(
+                select(User.id, literal(0).label("prefix"), (1 - distance).label("score"))
+                .where(fuzzy_match(query, User.email))
+                .order_by(distance)
+                .limit(limit)
+            )
+
+        ranked = rank_matches(*branches)
         result = await self.session.execute(
-            select(User).where(User.id == user_id)
+            select(User)
+            .join(ranked, ranked.c.id == User.id)
+            .order_by(ranked.c.prefix.desc(), ranked.c.score.desc(), User.email)
+            .limit(limit)
         )
 
-        return result.scalar_one_or_none()
+        return list(result.scalars())
 
-    async def get_all_users(self) -> List[User]:
+    async def get_all_users(
+            self,
+            company_id: Optional[UUID] = None,
+            project_id: Optional[UUID] = None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None
+    ) -> Tuple[List[User], Optional[str]]:
         """
-        Get all users in the system, ordered alphabetically by email.
+        Get a page of users ordered by email, optionally filtered by company
+        and/or project.
+
+        Args:
+            company_id: Optional company ID to filter users by
+            project_id: Optional project ID, to only get its members
+            limit: The maximum number of users to return
+            cursor: The cursor returned with the previous page, if any
 
         Returns:
-            A list of all users sorted by email address
+            The users of the page sorted by email and the cursor of the
+            next page, or None if this is the last page
+
+        Raises:
+            ValueError: If the cursor is invalid
         """
 
-        result = await self.session.execute(select(User).order_by(User.email))
+        query = select(User)
+
+        if company_id:
+            query = query.where(User.company_id == company_id)
 
-        return list(result.scalars().all())
+        if project_id:
+            # A user is a member of a project at most once, no duplicates.
+            # Same order as /projects/{id}/members: the project's memberships
+            # are read off the (project_id, user_id) index and sorted by email
+            query = query.join(ProjectMembership).where(ProjectMembership.project_id == project_id)
+
+        return await paginate(
+            self.session,
+            query,
+            (User.email, User.id),
+            limit,
+            cursor
+        )
 
     async def create_user(self, email: str, company_id: UUID):
         """
@@ -79,16 +207,19 @@ class UserService:
             ValueError: If a user with this email already exists
         """
 
-        existing = await self.get_user_by_email(email)
-
-        if existing:
-            raise ValueError(f"User with email {email} already exists")
+        result = await self.session.execute(
+            pg_insert(User)
+            .values(email=email, company_id=company_id)
+            .on_conflict_do_nothing(index_elements=["email"])
+            .returning(User)
+        )
 
-        user = User(email=email, company_id=company_id)
+        user = result.scalar_one_or_none()
 
-        self.session.add(user)
+        if user is None:
+            raise ValueError(f"User with email {email} already exists")
 
         await self.session.commit()
-        await self.session.refresh(user)
+        await response_cache.invalidate(company_users_key(company_id))
 
         return user
@@ -1,21 +1,59 @@
+import hmac
+from contextlib import asynccontextmanager
+from typing import Optional
 
 import uvicorn
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 from fastapi.openapi.utils import get_openapi
 
 from app.core.config import get_settings
 
-from app.core.middleware import APIKeyMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.core.middleware import APIKeyMiddleware, ReadYourWritesMiddleware
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.tasks import PeriodicTask
 from app.features.companies import router as companies
 from app.features.analytics import router as analytics
+from app.features.export import router as export
+from app.features.internal import router as internal
 from app.features.projects import router as projects
+from app.features.users import router as users
+from app.features.analytics.snapshot import analytics_snapshot
+from app.features.analytics.tasks import refresh_company_stats
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [
+        PeriodicTask(
+            "analytics-snapshot",
+            settings.analytics_snapshot_interval,
+            analytics_snapshot.refresh
+        ),
+        PeriodicTask(
+            "company-stats-refresh",
+            settings.company_stats_refresh_interval,
+            refresh_company_stats
+        ),
+    ]
+
+    for task in tasks:
+        task.start()
+
+    yield
+
+    for task in tasks:
+        await task.stop()
+
+
 app = FastAPI(
     title="BetterGroup - Challenge",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -48,11 +86,17 @@ def custom_openapi():
 
 
 app.openapi = custom_openapi
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
 app.add_middleware(APIKeyMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(companies.router, prefix="/api/v1", tags=["companies"])
 app.include_router(analytics.router, prefix="/api/v1", tags=["analytics"])
 app.include_router(projects.router, prefix="/api/v1", tags=["projects"])
+app.include_router(users.router, prefix="/api/v1", tags=["users"])
+app.include_router(export.router, prefix="/api/v1", tags=["export"])
+app.include_router(internal.router, prefix="/internal", tags=["internal"])
 
 
 @app.get("/health")
@@ -60,6 +104,15 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: Optional[str] = Header(None)):
+    if settings.metrics_token and not hmac.compare_digest(
+            (authorization or "").encode(), f"Bearer {settings.metrics_token}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing metrics token")
+
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     uvicorn.run(
         app,
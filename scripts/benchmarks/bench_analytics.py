@@ -0,0 +1,58 @@
+"""
+Compare the single-statement platform analytics query with the previous
+implementation, which ran seven statements one after the other.
+
+    python scripts/benchmarks/bench_analytics.py --seed --iterations 50
+"""
+import argparse
+import asyncio
+
+from common import measure, report
+from seed import add_seed_arguments, seed
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import async_session_maker
+from app.features.analytics.service import AnalyticsService
+from app.features.companies.models import Company
+from app.features.projects.models import Project, ProjectMembership
+from app.features.users.models import User
+
+
+async def sequential_analytics(session: AsyncSession):
+    """The seven round trips get_platform_analytics used to make."""
+
+    for model in (Company, User, Project, ProjectMembership):
+        await session.execute(select(func.count(model.id)))
+
+    for column, group_by in (
+        (User.id, User.company_id),
+        (Project.id, Project.company_id),
+        (ProjectMembership.id, ProjectMembership.project_id),
+    ):
+        subquery = select(func.count(column).label("total")).group_by(group_by).subquery()
+        await session.execute(select(func.avg(subquery.c.total)))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", action="store_true", help="Seed the dataset first")
+    parser.add_argument("--iterations", type=int, default=30)
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    async with async_session_maker() as session:
+        if args.seed:
+            await seed(session, args.companies, args.users_per_company, args.projects_per_company)
+
+        service = AnalyticsService(session)
+
+        report("sequential (7 statements)", await measure(
+            lambda: sequential_analytics(session), args.iterations))
+        report("single statement", await measure(
+            service.get_platform_analytics, args.iterations))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
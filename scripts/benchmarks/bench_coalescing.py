@@ -0,0 +1,82 @@
+"""
+Thundering herd on GET /projects/{id}: fire many identical requests at once
+through the ASGI app and count the statements they cost, with and without
+single-flight coalescing. The response cache is disabled so every request
+that isn't coalesced reaches the database.
+
+    python scripts/benchmarks/seed.py
+    python scripts/benchmarks/bench_coalescing.py --concurrency 200 --waves 10
+"""
+import argparse
+import asyncio
+import time
+
+import common  # noqa: F401  (sets up the import path)
+
+import httpx
+from sqlalchemy import func, select
+
+from app.core.cache import response_cache
+from app.core.config import get_settings
+from app.core.database import async_session_maker
+from app.core.query_stats import collect_queries
+from app.features.projects.models import ProjectMembership
+from app.main import app
+
+
+async def largest_project():
+    async with async_session_maker() as session:
+        return await session.scalar(
+            select(ProjectMembership.project_id)
+            .group_by(ProjectMembership.project_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        )
+
+
+async def herd(client: httpx.AsyncClient, url: str, concurrency: int, waves: int):
+    with collect_queries() as stats:
+        start = time.perf_counter()
+
+        for _ in range(waves):
+            responses = await asyncio.gather(*(client.get(url) for _ in range(concurrency)))
+
+            for response in responses:
+                response.raise_for_status()
+
+        elapsed = time.perf_counter() - start
+
+    return stats.count, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--waves", type=int, default=10)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    response_cache.backend = None
+
+    url = f"/api/v1/projects/{await largest_project()}"
+    requests = args.concurrency * args.waves
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://bench",
+        headers={"X-API-Key": settings.api_key},
+        limits=httpx.Limits(max_connections=None)
+    ) as client:
+        for label, enabled in (("uncoalesced", False), ("coalesced", True)):
+            settings.coalesce_reads = enabled
+            statements, elapsed = await herd(client, url, args.concurrency, args.waves)
+
+            print(
+                f"{label:<12} {statements:6d} statements for {requests} requests "
+                f"({statements / requests:.2f}/request), {requests / elapsed:8.1f} req/s"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
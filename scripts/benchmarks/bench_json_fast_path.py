@@ -0,0 +1,81 @@
+"""
+Compare the ORM + Pydantic read path with the Postgres-rendered JSON fast
+path, end to end through the ASGI app, on the project and company with the
+most members/users.
+
+Seed a dataset with large member lists first, e.g.:
+
+    python scripts/benchmarks/seed.py --companies 20 --users-per-company 5000 --projects-per-company 2
+    python scripts/benchmarks/bench_json_fast_path.py --iterations 200
+"""
+import argparse
+import asyncio
+
+from common import measure, report
+
+import httpx
+from sqlalchemy import func, select
+
+from app.core.cache import response_cache
+from app.core.config import get_settings
+from app.core.database import async_session_maker
+from app.features.projects.models import ProjectMembership
+from app.features.users.models import User
+from app.main import app
+
+ENDPOINTS = {
+    "projects.detail": "/api/v1/projects/{project_id}",
+    "projects.members": "/api/v1/projects/{project_id}/members?limit=500",
+    "companies.users": "/api/v1/companies/{company_id}/users",
+}
+
+
+async def largest_project_and_company():
+    async with async_session_maker() as session:
+        project_id = await session.scalar(
+            select(ProjectMembership.project_id)
+            .group_by(ProjectMembership.project_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        )
+        company_id = await session.scalar(
+            select(User.company_id)
+            .group_by(User.company_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        )
+
+    return project_id, company_id
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    # Measure the read paths, not the response cache in front of them
+    response_cache.backend = None
+    project_id, company_id = await largest_project_and_company()
+
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://bench",
+        headers={"X-API-Key": settings.api_key}
+    ) as client:
+        for endpoint, path in ENDPOINTS.items():
+            url = path.format(project_id=project_id, company_id=company_id)
+
+            async def call():
+                response = await client.get(url)
+                response.raise_for_status()
+
+            for label, db_json_endpoints in (("ORM", []), ("Postgres JSON", [endpoint])):
+                settings.db_json_endpoints = db_json_endpoints
+                report(f"{endpoint} {label}", await measure(call, args.iterations))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
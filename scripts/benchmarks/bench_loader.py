@@ -0,0 +1,69 @@
+"""
+Concurrent point lookups through CompanyService.get_company_by_id, each on
+its own session as separate requests would, with and without the shared
+batch loader. Reports statements run and lookups per second.
+
+    python scripts/benchmarks/seed.py
+    python scripts/benchmarks/bench_loader.py --concurrency 500
+"""
+import argparse
+import asyncio
+import time
+
+import common  # noqa: F401  (sets up the import path)
+
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.core.database import async_session_maker
+from app.core.query_stats import collect_queries
+from app.features.companies.models import Company
+from app.features.companies.service import CompanyService
+
+
+async def lookup(company_id):
+    async with async_session_maker() as session:
+        company = await CompanyService(session).get_company_by_id(company_id)
+
+    assert company is not None
+
+
+async def run(company_ids, rounds: int):
+    with collect_queries() as stats:
+        start = time.perf_counter()
+
+        for _ in range(rounds):
+            await asyncio.gather(*(lookup(company_id) for company_id in company_ids))
+
+        elapsed = time.perf_counter() - start
+
+    return stats.count, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--window", type=float, default=0.0, help="Batch window in seconds")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    settings.batch_loader_window = args.window
+
+    async with async_session_maker() as session:
+        company_ids = list(await session.scalars(select(Company.id).limit(args.concurrency)))
+
+    lookups = len(company_ids) * args.rounds
+
+    for scope in ("request", "global"):
+        settings.batch_loader_scope = scope
+        statements, elapsed = await run(company_ids, args.rounds)
+
+        print(
+            f"{scope:<8} {statements:6d} statements for {lookups} lookups, "
+            f"{lookups / elapsed:9.1f} lookups/s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Compare the throughput of the pure ASGI APIKeyMiddleware with the previous
+BaseHTTPMiddleware implementation, on /health and /api/v1/companies.
+
+The companies service is replaced by an in-memory stub so the numbers only
+reflect the HTTP stack, not the database.
+
+    python scripts/benchmarks/bench_middleware.py --requests 5000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import common  # noqa: F401  (sets up the import path)
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.config import get_settings
+from app.core.dependencies import get_company_read_service
+from app.core.middleware import APIKeyMiddleware
+from app.features.companies import router as companies
+
+
+class BaseHTTPAPIKeyMiddleware(BaseHTTPMiddleware):
+    """The middleware as it was before the pure ASGI rewrite."""
+
+    async def dispatch(self, request: Request, call_next):
+
+        if request.url.path in ["/docs", "/openapi.json", "/health", "/redoc"]:
+            return await call_next(request)
+
+        api_key = request.headers.get("X-API-Key")
+
+        if not api_key or api_key != get_settings().api_key:
+            return Response(
+                content='{"detail": "Invalid or missing API key"}',
+                status_code=401,
+                media_type="application/json"
+            )
+
+        return await call_next(request)
+
+
+class StubCompanyService:
+    def __init__(self, size: int):
+        self.companies = [
+            SimpleNamespace(id=uuid.uuid4(), name=f"Company {i}", domain=f"company{i}.example")
+            for i in range(size)
+        ]
+
+    async def get_all_companies(self, limit, cursor=None):
+        return self.companies[:limit], None
+
+
+def build_app(middleware, service: StubCompanyService) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware)
+    app.include_router(companies.router, prefix="/api/v1")
+    app.dependency_overrides[get_company_read_service] = lambda: service
+
+    @app.get("/health")
+    def health_check():
+        return {"status": "healthy"}
+
+    return app
+
+
+async def requests_per_second(app: FastAPI, path: str, total: int, concurrency: int) -> float:
+    headers = {"X-API-Key": get_settings().api_key}
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker(count: int):
+            for _ in range(count):
+                response = await client.get(path, headers=headers)
+                response.raise_for_status()
+
+        await worker(50)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(total // concurrency) for _ in range(concurrency)))
+
+        return (total // concurrency) * concurrency / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    service = StubCompanyService(args.page_size)
+
+    for path in ("/health", "/api/v1/companies"):
+        results = {}
+
+        for label, middleware in (
+            ("BaseHTTPMiddleware", BaseHTTPAPIKeyMiddleware),
+            ("pure ASGI", APIKeyMiddleware),
+        ):
+            app = build_app(middleware, service)
+            results[label] = await requests_per_second(app, path, args.requests, args.concurrency)
+            print(f"{path:<20} {label:<20} {results[label]:10.0f} req/s")
+
+        gain = results["pure ASGI"] / results["BaseHTTPMiddleware"] - 1
+        print(f"{path:<20} {'gain':<20} {gain:10.1%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+"""
+Latency of user and company search for a few kinds of queries: short and
+long prefixes, a typo, and a fragment shared by every bench email. The
+target is a p99 under 20ms with 10M users:
+
+    python scripts/benchmarks/seed.py --companies 10000 --users-per-company 1000
+    python scripts/benchmarks/bench_search.py --iterations 200
+"""
+import argparse
+import asyncio
+
+from common import measure, report
+
+from app.core.database import async_session_maker
+from app.core.search import DEFAULT_SEARCH_LIMIT
+from app.features.companies.service import CompanyService
+from app.features.users.service import UserService
+
+USER_QUERIES = {
+    "short prefix": "user1",
+    "long prefix": "user123@company42",
+    "typo": "usr123@compny42",
+    "common fragment": "bench.example",
+}
+
+COMPANY_QUERIES = {
+    "name prefix": "Bench 12",
+    "domain prefix": "company12",
+    "typo": "compny1234",
+}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=DEFAULT_SEARCH_LIMIT)
+    args = parser.parse_args()
+
+    async with async_session_maker() as session:
+        users = UserService(session)
+        companies = CompanyService(session)
+
+        for label, query in USER_QUERIES.items():
+            samples = await measure(lambda: users.search_users(query, args.limit), args.iterations)
+            report(f"users, {label}", samples)
+
+        for label, query in COMPANY_QUERIES.items():
+            samples = await measure(lambda: companies.search_companies(query, args.limit), args.iterations)
+            report(f"companies, {label}", samples)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Compare the CPU cost of building and encoding a page of users the
+validating way (model_validate, then FastAPI's response_model pass, then
+JSON encoding) with the trusted serialization mode.
+
+No database is needed, users are synthetic.
+
+    python scripts/benchmarks/bench_serialization.py --users 5000
+"""
+import argparse
+import json
+import statistics
+import time
+import uuid
+from types import SimpleNamespace
+
+import common  # noqa: F401  (sets up the import path)
+
+from pydantic import TypeAdapter
+
+from app.core.config import get_settings
+from app.core.pagination import Page
+from app.core.serialization import TrustedJSONResponse, build_page
+from app.features.users.schemas import UserResponse
+
+
+def validating(users, adapter: TypeAdapter) -> bytes:
+    page = Page[UserResponse](
+        items=[UserResponse.model_validate(user, from_attributes=True) for user in users],
+        next_cursor=None
+    )
+
+    # What FastAPI does with the return value when a response_model is set
+    validated = adapter.validate_python(page.model_dump())
+
+    return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+
+def trusted(users) -> bytes:
+    return TrustedJSONResponse(build_page(UserResponse, users, None)).body
+
+
+def cpu_time(fn, iterations: int):
+    samples = []
+
+    for _ in range(iterations):
+        start = time.process_time()
+        fn()
+        samples.append((time.process_time() - start) * 1000)
+
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    company_id = uuid.uuid4()
+    users = [
+        SimpleNamespace(id=uuid.uuid4(), email=f"user{i}@company.example", company_id=company_id)
+        for i in range(args.users)
+    ]
+    adapter = TypeAdapter(Page[UserResponse])
+    settings = get_settings()
+
+    settings.trusted_serialization = False
+    validating_samples = cpu_time(lambda: validating(users, adapter), args.iterations)
+
+    settings.trusted_serialization = True
+    trusted_samples = cpu_time(lambda: trusted(users), args.iterations)
+
+    for label, samples in (("validating", validating_samples), ("trusted", trusted_samples)):
+        print(f"{label:<12} {statistics.median(samples):8.2f}ms CPU per page of {args.users} users")
+
+    print(f"speedup      {statistics.median(validating_samples) / statistics.median(trusted_samples):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, List
+
+# In case python path its wrongfully set
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+
+    return ordered[index]
+
+
+async def measure(
+        fn: Callable[[], Awaitable[object]],
+        iterations: int,
+        warmup: int = 3
+) -> List[float]:
+    """
+    Time an async callable.
+
+    Args:
+        fn: The callable to time
+        iterations: How many timed calls to make
+        warmup: How many untimed calls to make first
+
+    Returns:
+        The latency of each timed call, in milliseconds
+    """
+
+    for _ in range(warmup):
+        await fn()
+
+    samples = []
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return samples
+
+
+def report(label: str, samples: List[float]):
+    print(
+        f"{label:<32} "
+        f"p50={percentile(samples, 50):8.2f}ms "
+        f"p99={percentile(samples, 99):8.2f}ms "
+        f"mean={statistics.fmean(samples):8.2f}ms "
+        f"n={len(samples)}"
+    )
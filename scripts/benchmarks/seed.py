@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import logging
+
+import common  # noqa: F401  (sets up the import path)
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import async_session_maker
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+BENCH_DOMAIN_SUFFIX = ".bench.example"
+
+SEED_COMPANIES = text("""
+    INSERT INTO companies (id, name, domain)
+    SELECT gen_random_uuid(), 'Bench ' || g, 'company' || g || :suffix
+    FROM generate_series(1, :companies) g
+    ON CONFLICT (domain) DO NOTHING
+""")
+
+SEED_USERS = text("""
+    INSERT INTO users (id, email, company_id)
+    SELECT gen_random_uuid(), 'user' || g || '@' || c.domain, c.id
+    FROM companies c
+    CROSS JOIN generate_series(1, :users_per_company) g
+    WHERE c.domain LIKE '%' || :suffix
+    ON CONFLICT (email) DO NOTHING
+""")
+
+SEED_PROJECTS = text("""
+    INSERT INTO projects (id, name, company_id)
+    SELECT gen_random_uuid(), c.name || ' Project ' || g, c.id
+    FROM companies c
+    CROSS JOIN generate_series(1, :projects_per_company) g
+    WHERE c.domain LIKE '%' || :suffix
+      AND NOT EXISTS (
+          SELECT 1 FROM projects p
+          WHERE p.company_id = c.id AND p.name = c.name || ' Project ' || g
+      )
+""")
+
+SEED_MEMBERSHIPS = text("""
+    INSERT INTO project_memberships (id, project_id, user_id, company_id)
+    SELECT gen_random_uuid(), p.id, u.id, u.company_id
+    FROM users u
+    JOIN projects p ON p.company_id = u.company_id
+    WHERE u.email LIKE '%' || :suffix
+    ON CONFLICT (project_id, user_id) DO NOTHING
+""")
+
+
+async def seed(
+        session: AsyncSession,
+        companies: int = 1000,
+        users_per_company: int = 100,
+        projects_per_company: int = 10
+):
+    """
+    Seed a synthetic dataset where every user is a member of every project
+    of their company. The defaults produce 1M memberships.
+
+    Seeding is idempotent: rows that already exist are left alone.
+
+    Args:
+        session: The session to seed with
+        companies: Number of companies to create
+        users_per_company: Number of users per company
+        projects_per_company: Number of projects per company
+    """
+
+    params = {"suffix": BENCH_DOMAIN_SUFFIX}
+
+    await session.execute(SEED_COMPANIES, {**params, "companies": companies})
+    await session.execute(SEED_USERS, {**params, "users_per_company": users_per_company})
+    await session.execute(SEED_PROJECTS, {**params, "projects_per_company": projects_per_company})
+    await session.execute(SEED_MEMBERSHIPS, params)
+    await session.execute(text("ANALYZE"))
+    await session.commit()
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--companies", type=int, default=1000)
+    parser.add_argument("--users-per-company", type=int, default=100)
+    parser.add_argument("--projects-per-company", type=int, default=10)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Seed a synthetic benchmark dataset")
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    async with async_session_maker() as session:
+        await seed(session, args.companies, args.users_per_company, args.projects_per_company)
+
+    logger.info("Benchmark dataset seeded")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,23 +1,147 @@
+import argparse
+import heapq
 import logging
 import os
 import sys
-from typing import List
+from typing import Dict, List, NamedTuple
 
 import httpx
 import asyncio
 
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
 # In case python path its wrongfully set
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from app.core.config import get_settings
-from app.core.database import get_session
-from app.features.companies.service import CompanyService
-from app.features.projects.service import ProjectService
-from app.features.users.service import UserService
+from app.core.database import async_session_maker, get_session
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+SAMPLE_PROJECT_SUFFIXES = ["Sample Project 1", "Sample Project 2"]
+
+# More shards than workers keeps every worker busy when company sizes are skewed
+SHARDS_PER_WORKER = 4
+
+STAGING_TABLE = "staged_emails"
+
+CREATE_STAGING_TABLE = text(f"""
+    CREATE TEMP TABLE {STAGING_TABLE} (
+        email text PRIMARY KEY,
+        domain text NOT NULL,
+        company_name text NOT NULL,
+        position integer NOT NULL,
+        company_id uuid
+    ) ON COMMIT DROP
+""")
+
+# Every upsert is shaped the same way: a `candidates` CTE with the rows we
+# want, an `inserted` CTE that writes the missing ones, and a final SELECT
+# returning both counts so skipped rows can be reported without extra queries.
+UPSERT_COMPANIES = text(f"""
+    WITH candidates AS (
+        SELECT DISTINCT ON (company_name) company_name AS name, domain
+        FROM {STAGING_TABLE}
+        ORDER BY company_name, position
+    ), inserted AS (
+        INSERT INTO companies (id, name, domain)
+        SELECT gen_random_uuid(), c.name, c.domain
+        FROM candidates c
+        WHERE NOT EXISTS (SELECT 1 FROM companies e WHERE e.name = c.name)
+        ON CONFLICT (domain) DO NOTHING
+        RETURNING id
+    )
+    SELECT (SELECT count(*) FROM candidates), (SELECT count(*) FROM inserted)
+""")
+
+RESOLVE_COMPANIES = text(f"""
+    UPDATE {STAGING_TABLE} s
+    SET company_id = c.id
+    FROM (
+        SELECT DISTINCT ON (name) name, id
+        FROM companies
+        WHERE name IN (SELECT company_name FROM {STAGING_TABLE})
+        ORDER BY name, created_at, id
+    ) c
+    WHERE c.name = s.company_name
+""")
+
+# A company whose domain already belongs to a company of another name isn't
+# created (the domain is unique) nor resolved: its users and projects stay
+# candidates so they are counted as skipped, and are logged.
+UNRESOLVED_COMPANIES = text(f"""
+    SELECT company_name, domain, count(*)
+    FROM {STAGING_TABLE}
+    WHERE company_id IS NULL
+    GROUP BY company_name, domain
+    ORDER BY company_name, domain
+""")
+
+UPSERT_USERS = text(f"""
+    WITH candidates AS (
+        SELECT email, company_id
+        FROM {STAGING_TABLE}
+    ), inserted AS (
+        INSERT INTO users (id, email, company_id)
+        SELECT gen_random_uuid(), email, company_id
+        FROM candidates
+        WHERE company_id IS NOT NULL
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id
+    )
+    SELECT (SELECT count(*) FROM candidates), (SELECT count(*) FROM inserted)
+""")
+
+UPSERT_PROJECTS = text(f"""
+    WITH candidates AS (
+        SELECT DISTINCT s.company_id, s.company_name || ' ' || t.suffix AS name
+        FROM {STAGING_TABLE} s
+        CROSS JOIN unnest(CAST(:suffixes AS text[])) AS t(suffix)
+    ), inserted AS (
+        INSERT INTO projects (id, name, company_id)
+        SELECT gen_random_uuid(), c.name, c.company_id
+        FROM candidates c
+        WHERE c.company_id IS NOT NULL
+          AND NOT EXISTS (
+            SELECT 1 FROM projects p
+            WHERE p.company_id = c.company_id AND p.name = c.name
+        )
+        RETURNING id
+    )
+    SELECT (SELECT count(*) FROM candidates), (SELECT count(*) FROM inserted)
+""")
+
+# Users that already existed under another company are kept as candidates so
+# they show up as skipped, the same way add_user_to_project refuses them.
+UPSERT_MEMBERSHIPS = text(f"""
+    WITH candidates AS (
+        SELECT p.id AS project_id, u.id AS user_id,
+               p.company_id, u.company_id AS user_company_id
+        FROM {STAGING_TABLE} s
+        JOIN users u ON u.email = s.email
+        CROSS JOIN unnest(CAST(:suffixes AS text[])) AS t(suffix)
+        JOIN projects p
+          ON p.company_id = s.company_id
+         AND p.name = s.company_name || ' ' || t.suffix
+    ), inserted AS (
+        INSERT INTO project_memberships (id, project_id, user_id, company_id)
+        SELECT gen_random_uuid(), project_id, user_id, company_id
+        FROM candidates
+        WHERE user_company_id = company_id
+        ON CONFLICT (project_id, user_id) DO NOTHING
+        RETURNING id
+    )
+    SELECT (SELECT count(*) FROM candidates), (SELECT count(*) FROM inserted)
+""")
+
+
+class UpsertResult(NamedTuple):
+    inserted: int
+    skipped: int
+
+
 def extract_domain_and_company(email: str) -> tuple[str, str]:
     domain = email.split("@")[1]
     company_name = domain.split(".")[0].capitalize()
@@ -44,77 +168,201 @@ async def fetch_emails() -> List[str]:
             return []
 
 
-async def sync_companies_and_users(db, emails: List[str]):
-    companies_cache = {}
-    users_cache = {}
+async def stage_emails(db: AsyncSession, emails: List[str]) -> int:
+    """
+    Load the fetched emails into a transaction-scoped temp table with COPY.
+
+    Args:
+        db: The session whose transaction owns the staging table
+        emails: The fetched emails, duplicates allowed
+
+    Returns:
+        The number of distinct emails staged
+    """
+
+    records = {}
+
+    for position, email in enumerate(emails):
+        if email not in records:
+            domain, company_name = extract_domain_and_company(email)
+            records[email] = (email, domain, company_name, position)
+
+    await db.execute(CREATE_STAGING_TABLE)
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+
+    await raw_connection.driver_connection.copy_records_to_table(
+        STAGING_TABLE,
+        records=list(records.values()),
+        columns=["email", "domain", "company_name", "position"]
+    )
+
+    return len(records)
+
+
+async def _upsert(db: AsyncSession, statement, **params) -> UpsertResult:
+    result = await db.execute(statement, params)
+    candidates, inserted = result.one()
+
+    return UpsertResult(inserted=inserted, skipped=candidates - inserted)
+
+
+async def bulk_sync(db: AsyncSession, emails: List[str]) -> Dict[str, UpsertResult]:
+    """
+    Upsert companies, users, sample projects and memberships for a set of
+    emails in a single transaction, with a fixed number of statements
+    regardless of how many emails there are.
+
+    Args:
+        db: The session to run the sync on
+        emails: The emails to sync
+
+    Returns:
+        The inserted and skipped row counts per table
+    """
+
+    try:
+        await stage_emails(db, emails)
+
+        report = {"companies": await _upsert(db, UPSERT_COMPANIES)}
+
+        await db.execute(RESOLVE_COMPANIES)
+
+        for name, domain, count in (await db.execute(UNRESOLVED_COMPANIES)).all():
+            logger.warning(
+                f"Skipping {count} users of {name}: domain {domain} belongs to another company")
+
+        report["users"] = await _upsert(db, UPSERT_USERS)
+        report["projects"] = await _upsert(
+            db, UPSERT_PROJECTS, suffixes=SAMPLE_PROJECT_SUFFIXES)
+        report["project_memberships"] = await _upsert(
+            db, UPSERT_MEMBERSHIPS, suffixes=SAMPLE_PROJECT_SUFFIXES)
 
-    companies_service = CompanyService(db)
-    users_service = UserService(db)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    return report
+
+
+def shard_emails(emails: List[str], shard_count: int) -> List[List[str]]:
+    """
+    Split emails into shards that never share a company.
+
+    Companies are keyed by the name derived from the email domain, so all
+    the emails of a company land in the same shard and shards can be synced
+    concurrently without touching each other's rows.
+
+    Args:
+        emails: The emails to split
+        shard_count: The maximum number of shards to create
+
+    Returns:
+        The shards, balanced by number of emails
+    """
+
+    companies: Dict[str, List[str]] = {}
 
     for email in emails:
-        domain, company_name = extract_domain_and_company(email)
-
-        if company_name not in companies_cache:
-            company = await companies_service.get_company_by_name(company_name)
-
-            if not company:
-                company = await companies_service.create_company(company_name, domain)
-                logger.info(f"Company created: {company_name}")
-
-            companies_cache[company_name] = company
-            users_cache[company_name] = []
-
-        existing_user = await users_service.get_user_by_email(email)
-        
-        if existing_user:
-            logger.info(f"User already exists: {email}, skipping creation")
-            user = existing_user
-        else:
-            user = await users_service.create_user(email, companies_cache[company_name].id)
-            logger.info(f"User created: {email}")
-
-        users_cache[company_name].append(user)
-
-    return companies_cache, users_cache
-
-async def assign_projects(db, companies_cache, users_cache):
-    projects_service = ProjectService(db)
-
-    for company_name, company in companies_cache.items():
-        project_names = [f"{company_name} Sample Project 1", f"{company_name} Sample Project 2"]
-
-        projects = []
-        for name in project_names:
-            existing_project = await projects_service.get_project_by_name_and_company(name, company.id)
-            
-            if existing_project:
-                logger.info(f"Project already exists: {name}, using existing project")
-                project = existing_project
-            else:
-                project = await projects_service.create_project(name, company.id)
-                logger.info(f"Project created: {name}")
-            
-            projects.append(project)
-
-        for user in users_cache[company_name]:
-            for project in projects:
-                membership = await projects_service.add_user_to_project(project.id, user.id)
-                if membership:
-                    logger.info(f"Assigned {user.email} to project {project.name}")
-                else:
-                    logger.info(f"User {user.email} already assigned to project {project.name}")
-
-async def main():
+        _, company_name = extract_domain_and_company(email)
+        companies.setdefault(company_name, []).append(email)
+
+    shards: List[List[str]] = [[] for _ in range(min(shard_count, len(companies)))]
+    heap = [(0, index) for index in range(len(shards))]
+
+    # Biggest companies first, each one going to the emptiest shard
+    for company_emails in sorted(companies.values(), key=len, reverse=True):
+        size, index = heapq.heappop(heap)
+        shards[index].extend(company_emails)
+        heapq.heappush(heap, (size + len(company_emails), index))
+
+    return shards
+
+
+async def sync_shard(
+        semaphore: asyncio.Semaphore, number: int, emails: List[str]
+) -> Dict[str, UpsertResult]:
+    async with semaphore:
+        async with async_session_maker() as db:
+            report = await bulk_sync(db, emails)
+
+    logger.info(f"Shard {number}: {len(emails)} emails synced")
+
+    return report
+
+
+async def parallel_sync(emails: List[str], workers: int) -> Dict[str, UpsertResult]:
+    """
+    Sync emails in company-disjoint shards, each one in its own session and
+    transaction, with at most `workers` shards running at once.
+
+    Args:
+        emails: The emails to sync
+        workers: The maximum number of concurrent shards (and connections)
+
+    Returns:
+        The inserted and skipped row counts per table, summed over all shards
+    """
+
+    semaphore = asyncio.Semaphore(workers)
+    shards = shard_emails(emails, workers * SHARDS_PER_WORKER)
+
+    reports = await asyncio.gather(*(
+        sync_shard(semaphore, number, shard)
+        for number, shard in enumerate(shards)
+    ))
+
+    totals: Dict[str, UpsertResult] = {}
+
+    for report in reports:
+        for table, result in report.items():
+            total = totals.get(table, UpsertResult(0, 0))
+            totals[table] = UpsertResult(
+                inserted=total.inserted + result.inserted,
+                skipped=total.skipped + result.skipped
+            )
+
+    return totals
+
+
+def log_report(report: Dict[str, UpsertResult]):
+    for table, result in report.items():
+        logger.info(f"{table}: {result.inserted} inserted, {result.skipped} skipped")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sync users from the BetterGroup API")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of shards synced concurrently, each on its own connection"
+    )
+
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    return args
+
+
+async def main(workers: int = 1):
     emails = await fetch_emails()
 
     if not emails:
         logger.error("No emails fetched.")
         return
-    
-    async for db in get_session():
-        companies_cache, users_cache = await sync_companies_and_users(db, emails)
 
-        await assign_projects(db, companies_cache, users_cache)
+    if workers > 1:
+        report = await parallel_sync(emails, workers)
+    else:
+        async for db in get_session():
+            report = await bulk_sync(db, emails)
+
+    log_report(report)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args().workers))
@@ -0,0 +1,26 @@
+import asyncio
+import logging
+import os
+import sys
+
+# In case python path its wrongfully set
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.database import get_session
+from app.features.analytics.service import AnalyticsService
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+async def main():
+    async for db in get_session():
+        service = AnalyticsService(db)
+
+        await service.rebuild_counters()
+
+        analytics = await service.get_counter_analytics()
+        logger.info(f"Counters rebuilt: {analytics.model_dump()}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
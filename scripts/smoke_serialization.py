@@ -0,0 +1,89 @@
+"""
+Smoke test of the JSON responses against the database configured in .env:
+every ORM-backed read is requested through the app, with trusted
+serialization on and off, and must answer 200 with JSON that parses.
+Exits with a non-zero status on the first failure.
+
+    python scripts/benchmarks/seed.py
+    python scripts/smoke_serialization.py
+"""
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+
+# In case python path its wrongfully set
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.cache import create_backend, response_cache
+from app.core.config import get_settings
+from app.main import app
+
+
+async def get_json(client: httpx.AsyncClient, path: str):
+    response = await client.get(path)
+
+    if response.status_code != 200:
+        raise SystemExit(f"GET {path}: {response.status_code} {response.text[:200]}")
+
+    return response.json()
+
+
+async def get_ndjson(client: httpx.AsyncClient, path: str):
+    response = await client.get(path)
+    lines = response.content.splitlines()
+
+    if response.status_code != 200 or not lines:
+        raise SystemExit(f"GET {path}: {response.status_code} with {len(lines)} lines")
+
+    for line in lines:
+        json.loads(line)
+
+
+async def check(client: httpx.AsyncClient):
+    companies = await get_json(client, "/api/v1/companies?limit=5")
+    projects = await get_json(client, "/api/v1/projects?limit=5")
+
+    if not companies["items"] or not projects["items"]:
+        raise SystemExit("No data to check, seed the database first")
+
+    company_id = companies["items"][0]["id"]
+    project_id = projects["items"][0]["id"]
+
+    for path in (
+        f"/api/v1/companies?ids={company_id}",
+        f"/api/v1/companies/{company_id}",
+        f"/api/v1/companies/{company_id}/users",
+        f"/api/v1/projects/{project_id}",
+        f"/api/v1/projects/{project_id}/members",
+        # Sparse fieldsets skip the response models
+        f"/api/v1/companies/{company_id}/users?fields=name",
+        f"/api/v1/companies/{company_id}/users?fields=domain&include=users",
+        f"/api/v1/projects/{project_id}?fields=name",
+        f"/api/v1/projects/{project_id}?include=members,company&fields=name",
+    ):
+        await get_json(client, path)
+
+    for path in ("/api/v1/export/companies", "/api/v1/export/users"):
+        await get_ndjson(client, path)
+
+
+async def main():
+    settings = get_settings()
+    transport = httpx.ASGITransport(app=app)
+    headers = {"X-API-Key": settings.api_key}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://smoke", headers=headers) as client:
+        for trusted in (True, False):
+            settings.trusted_serialization = trusted
+            # Start from an empty cache, so every read goes to the database
+            response_cache.backend = create_backend()
+
+            await check(client)
+            print(f"trusted_serialization={trusted}: ok")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.config import get_settings
+from app.core.metrics import MetricsMiddleware
+
+
+def requests_counted(route: str, status: int = 200) -> float:
+    labels = {"method": "GET", "route": route, "status": str(status)}
+
+    return REGISTRY.get_sample_value("http_requests_total", labels) or 0.0
+
+
+def test_prefixed_route_is_labelled_with_its_prefix():
+    from app.main import app
+
+    before = requests_counted("/internal/pool")
+
+    # Without the lifespan: the periodic tasks aren't needed, and /internal/pool
+    # only reads the pool statistics
+    response = TestClient(app).get(
+        "/internal/pool", headers={"X-API-Key": get_settings().api_key})
+
+    assert response.status_code == 200
+    assert requests_counted("/internal/pool") == before + 1
+    assert requests_counted("/pool") == 0
+
+
+def test_route_parameters_stay_templated_under_a_prefix():
+    router = APIRouter()
+
+    @router.get("/jobs/{job_id}")
+    def get_job(job_id: str):
+        return {"id": job_id}
+
+    mounted = FastAPI()
+    mounted.include_router(router)
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router, prefix="/included")
+    app.mount("/mounted", mounted)
+    client = TestClient(app)
+
+    for prefix in ("/included", "/mounted"):
+        before = requests_counted(f"{prefix}/jobs/{{job_id}}")
+        response = client.get(f"{prefix}/jobs/1")
+
+        assert response.status_code == 200
+        assert requests_counted(f"{prefix}/jobs/{{job_id}}") == before + 1
+
+
+def test_unmatched_requests_share_one_label():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    before = requests_counted("unmatched", 404)
+    response = TestClient(app).get("/no/such/path")
+
+    assert response.status_code == 404
+    assert requests_counted("unmatched", 404) == before + 1
@@ -0,0 +1,88 @@
+"""
+Statement budgets of the entity reads, checked against the database
+configured in .env (seeded with scripts/benchmarks/seed.py, or synced).
+Skipped when the database can't be reached.
+"""
+import httpx
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.cache import create_backend, response_cache
+from app.core.config import get_settings
+from app.core.database import engine
+from app.core.query_stats import assert_max_queries
+from app.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    except (OSError, SQLAlchemyError) as e:
+        pytest.skip(f"Database unavailable: {e}")
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"X-API-Key": get_settings().api_key}
+
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            yield client
+    finally:
+        # Connections belong to this test's event loop
+        await engine.dispose()
+
+
+@pytest.fixture(params=[False, True], ids=["orm", "db-json"])
+def db_json(request, monkeypatch):
+    endpoints = ["projects.detail", "companies.users"] if request.param else []
+    monkeypatch.setattr(get_settings(), "db_json_endpoints", endpoints)
+
+
+async def busiest(statement: str):
+    """The id selected by the statement, skipping the test when there is none."""
+
+    async with engine.connect() as connection:
+        found = (await connection.execute(text(statement))).scalar()
+
+    if found is None:
+        pytest.skip("No data to read, seed the database first")
+
+    return found
+
+
+async def get_within_budget(client: httpx.AsyncClient, path: str, max_queries: int):
+    # Start from an empty cache, so the read goes to the database
+    response_cache.backend = create_backend()
+
+    with assert_max_queries(max_queries):
+        response = await client.get(path)
+
+    assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("query", ["", "?fields=name", "?fields=name&include=members,company"])
+async def test_project_details_run_one_statement(client, db_json, query):
+    project_id = await busiest(
+        "SELECT project_id FROM project_memberships GROUP BY project_id ORDER BY count(*) DESC LIMIT 1")
+
+    # The project, its company and its first page of members are joined
+    await get_within_budget(client, f"/api/v1/projects/{project_id}{query}", 1)
+
+
+@pytest.mark.parametrize("query", ["", "?fields=name"])
+async def test_company_users_run_one_statement(client, db_json, query):
+    # A company with users, the endpoint answers 404 otherwise
+    company_id = await busiest(
+        "SELECT company_id FROM users GROUP BY company_id ORDER BY count(*) DESC LIMIT 1")
+
+    # The company and its first page of users are joined
+    await get_within_budget(client, f"/api/v1/companies/{company_id}/users{query}", 1)